@@ -1,38 +1,51 @@
+import os
+import sys
 import pandas as pd
 
-df = pd.read_csv('data/output/gps_master.csv')
-
-# Tylko backup pliki
-backup_files = df[df['source_file'].str.contains('full_backup', na=False)]
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from core.dataset import default_master_path, iter_master
+
+# Points per (track, route_timestamp), merged over chunks of the master
+partials = []
+for df in iter_master(default_master_path('data/output'), columns=['track_name', 'route_timestamp', 'source_file'],
+                      chunk_size=500_000):
+    # Tylko backup pliki
+    backup_files = df[df['source_file'].astype(str).str.contains('full_backup', na=False)]
+    partials.append(backup_files.groupby(['track_name', 'route_timestamp'], sort=False, dropna=False,
+                                         observed=True).size())
+counts = (pd.concat(partials).groupby(level=[0, 1], sort=False, dropna=False).sum()
+          if partials else pd.Series(dtype='int64'))
+counts = counts.rename('points').reset_index() if len(counts) else pd.DataFrame(
+    columns=['track_name', 'route_timestamp', 'points'])
 
 print('=== ROUTE TIMESTAMP UNIQUENESS ===')
-print(f'Total backup points: {len(backup_files)}')
+print(f'Total backup points: {counts["points"].sum()}')
 
 # Unikalne route_timestamp
-unique_timestamps = backup_files['route_timestamp'].dropna().unique()
+unique_timestamps = counts['route_timestamp'].dropna().unique()
 print(f'Unique route_timestamp values: {len(unique_timestamps)}')
 
 print('\n=== All unique route_timestamp values ===')
 for ts in sorted(unique_timestamps):
-    count = backup_files[backup_files['route_timestamp'] == ts]['track_name'].nunique()
+    count = counts[counts['route_timestamp'] == ts]['track_name'].nunique()
     print(f'{ts} -> {count} tracks')
 
 print('\n=== Tracks without route_timestamp ===')
-no_timestamp = backup_files[backup_files['route_timestamp'].isna()]
-print(f'Points without timestamp: {len(no_timestamp)}')
+no_timestamp = counts[counts['route_timestamp'].isna()]
+print(f'Points without timestamp: {no_timestamp["points"].sum()}')
 print(f'Unique tracks without timestamp: {no_timestamp["track_name"].nunique()}')
 
 print('\nSample tracks without timestamp:')
 for track_name in no_timestamp['track_name'].unique()[:5]:
     track_data = no_timestamp[no_timestamp['track_name'] == track_name]
-    print(f'  {track_name}: {len(track_data)} points')
+    print(f'  {track_name}: {track_data["points"].sum()} points')
 
 print('\n=== VERIFICATION: Each track should have same timestamp ===')
-for track_name in backup_files['track_name'].unique()[:10]:
-    track_data = backup_files[backup_files['track_name'] == track_name]
+for track_name in counts['track_name'].unique()[:10]:
+    track_data = counts[counts['track_name'] == track_name]
     timestamps = track_data['route_timestamp'].unique()
     if len(timestamps) > 1:
         print(f'ERROR: {track_name} has {len(timestamps)} different timestamps!')
     else:
-        ts = timestamps[0] if len(timestamps) == 1 else 'NO_TIMESTAMP'
-        print(f'OK: {track_name} -> {ts} ({len(track_data)} points)')
+        ts = timestamps[0] if len(timestamps) == 1 and pd.notna(timestamps[0]) else 'NO_TIMESTAMP'
+        print(f'OK: {track_name} -> {ts} ({track_data["points"].sum()} points)')
@@ -1,19 +1,39 @@
-from .processor import RouteProcessor
-from .converter import (
-    df_to_kml,
-    kml_to_df, 
-    gpx_to_df,
-    df_to_gpx,
-    convert_gpx_to_kml,
-    convert_kml_to_gpx
-)
+"""Core GPX/KML processing
+
+Submodules are imported on first use of one of the names below (PEP 562),
+so ``import core`` itself loads neither numpy nor pandas.
+"""
+import importlib
+
+_LAZY_NAMES = {
+    'RouteProcessor': 'processor',
+    'df_to_kml': 'converter',
+    'kml_to_df': 'converter',
+    'gpx_to_df': 'converter',
+    'df_to_gpx': 'converter',
+    'convert_gpx_to_kml': 'converter',
+    'convert_kml_to_gpx': 'converter',
+}
 
 __all__ = [
     'RouteProcessor',
     'df_to_kml',
     'kml_to_df',
-    'gpx_to_df', 
+    'gpx_to_df',
     'df_to_gpx',
     'convert_gpx_to_kml',
     'convert_kml_to_gpx'
 ]
+
+
+def __getattr__(name):
+    module = _LAZY_NAMES.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f'.{module}', __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
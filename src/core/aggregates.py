@@ -0,0 +1,80 @@
+"""Mergeable partial aggregates for out-of-core analysis
+
+A chunk of points reduces to a small partial result that can be combined
+with the partials of other chunks in any order, so statistics of a dataset
+larger than memory come from one streaming pass. Counts, sums, minima and
+maxima merge directly; means and variances are kept as (count, mean, M2)
+and combined with the parallel form of Welford's update (Chan et al.),
+which stays accurate where a running sum of squares would not.
+"""
+import numpy as np
+import pandas as pd
+
+STAT_COLUMNS = ['count', 'sum', 'mean', 'std', 'min', 'max']
+
+
+class RunningStats:
+    """Count, sum, min, max, mean and variance of one column, optionally per group"""
+
+    def __init__(self):
+        # Partial state per group key: count, sum, mean, m2, min, max
+        self._state = None
+
+    @staticmethod
+    def _reduce(values, keys=None):
+        values = pd.Series(np.asarray(values, dtype=np.float64))
+        if keys is None:
+            keys = np.zeros(len(values), dtype=np.int8)
+        elif isinstance(keys, (list, tuple)):
+            keys = [np.asarray(key) for key in keys]
+        else:
+            keys = np.asarray(keys)
+        grouped = values.groupby(keys, sort=False, observed=True)
+        state = grouped.agg(['count', 'sum', 'mean', 'min', 'max'])
+        state['m2'] = grouped.var(ddof=0).fillna(0.0) * state['count']
+        return state[['count', 'sum', 'mean', 'm2', 'min', 'max']]
+
+    def update(self, values, keys=None):
+        """Add a chunk of values; ``keys`` are per-value group keys (one array or a list of them)"""
+        return self.merge(self._reduce(values, keys))
+
+    def merge(self, other):
+        """Combine with another partial (a ``RunningStats`` or its state frame)"""
+        other = other._state if isinstance(other, RunningStats) else other
+        if other is None:
+            return self
+        if self._state is None:
+            self._state = other.copy()
+            return self
+
+        index = self._state.index.append(other.index.difference(self._state.index))
+        a = self._state.reindex(index)
+        b = other.reindex(index)
+        count_a = a['count'].fillna(0).to_numpy()
+        count_b = b['count'].fillna(0).to_numpy()
+        mean_a = a['mean'].fillna(0).to_numpy()
+        mean_b = b['mean'].fillna(0).to_numpy()
+        count = count_a + count_b
+        delta = mean_b - mean_a
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = np.where(count > 0, mean_a + delta * count_b / count, np.nan)
+            m2 = (a['m2'].fillna(0).to_numpy() + b['m2'].fillna(0).to_numpy()
+                  + np.where(count > 0, delta * delta * count_a * count_b / count, 0.0))
+        self._state = pd.DataFrame({
+            'count': count.astype(np.int64),
+            'sum': a['sum'].fillna(0).to_numpy() + b['sum'].fillna(0).to_numpy(),
+            'mean': mean,
+            'm2': m2,
+            'min': np.fmin(a['min'].to_numpy(), b['min'].to_numpy()),
+            'max': np.fmax(a['max'].to_numpy(), b['max'].to_numpy()),
+        }, index=index)
+        return self
+
+    def result(self, ddof=1):
+        """Statistics per group key: count, sum, mean, std (with ``ddof``), min, max"""
+        if self._state is None:
+            return pd.DataFrame(columns=STAT_COLUMNS)
+        state = self._state
+        with np.errstate(divide='ignore', invalid='ignore'):
+            variance = np.where(state['count'] > ddof, state['m2'] / (state['count'] - ddof), np.nan)
+        return state.assign(std=np.sqrt(variance))[STAT_COLUMNS]
@@ -0,0 +1,356 @@
+import numpy as np
+import pandas as pd
+
+from .aggregates import RunningStats
+from .dataset import iter_master, read_master
+from .density import DEFAULT_CELL_SIZE_M, DEFAULT_LEVELS, density_grids
+from .elevation import clean_elevation, hysteresis
+from .geodesy import segment_diff, segment_distances, segment_speeds
+from .segmentation import classify_modes, mode_segments
+from .spatial import SpatialIndex, open_spatial_index
+
+# Columns read from the master for analysis
+ANALYSIS_COLUMNS = ['track_name', 'source_file', 'latitude', 'longitude', 'altitude', 'time']
+
+# Per-track statistics, after the track key columns
+TRACK_STAT_COLUMNS = ['points', 'distance_km', 'duration_s', 'moving_time_s',
+                      'elevation_gain_m', 'elevation_loss_m', 'max_speed_kmh', 'avg_speed_kmh',
+                      'min_latitude', 'max_latitude', 'min_longitude', 'max_longitude',
+                      'min_altitude', 'max_altitude', 'start_time', 'end_time']
+
+# How partial per-track statistics of separate chunks combine
+TRACK_STAT_MERGE = {
+    'points': 'sum', 'distance_km': 'sum', 'moving_time_s': 'sum',
+    'elevation_gain_m': 'sum', 'elevation_loss_m': 'sum', 'max_speed_kmh': 'max',
+    'min_latitude': 'min', 'max_latitude': 'max', 'min_longitude': 'min', 'max_longitude': 'max',
+    'min_altitude': 'min', 'max_altitude': 'max', 'start_time': 'min', 'end_time': 'max',
+}
+
+
+class RouteAnalyzer:
+    """Per-track analytics over the master dataset
+
+    Every statistic is computed for all tracks at once: points are ordered
+    by track, consecutive-point segments are formed with array shifts, and
+    per-track totals come from grouped reductions. Elevation is cleaned
+    first (see ``core.elevation``): gaps are interpolated, the profile is
+    smoothed with ``elevation_smoothing`` over ``elevation_window`` points,
+    and gain/loss ignore changes inside a ``gain_threshold_m`` dead band.
+
+    With ``chunk_size`` (rows) and a master file, track and column
+    statistics are computed out of core in one streaming pass instead of
+    loading the master: see ``get_track_stats`` and ``get_column_stats``.
+    """
+
+    def __init__(self, master, track_columns=('source_file', 'track_name'),
+                 moving_speed_kmh=1.0, max_speed_kmh=150.0, distance_method='haversine', summary=None,
+                 elevation_smoothing='rolling', elevation_window=5, gain_threshold_m=3.0, chunk_size=None):
+        self.master = master
+        self.summary = summary
+        self.chunk_size = chunk_size
+        self.track_columns = list(track_columns)
+        self.distance_method = distance_method
+        self.moving_speed_kmh = moving_speed_kmh
+        self.max_speed_kmh = max_speed_kmh
+        self.elevation_smoothing = elevation_smoothing
+        self.elevation_window = elevation_window
+        self.gain_threshold_m = gain_threshold_m
+        self._points = None
+        self._track_stats = None
+        self._spatial_index = None
+
+    @property
+    def streaming(self):
+        """Whether statistics are computed chunk by chunk from the master file"""
+        return bool(self.chunk_size) and not isinstance(self.master, pd.DataFrame)
+
+    def _chunk_analyzer(self, points):
+        """In-memory analyzer over one chunk, with the same settings"""
+        return RouteAnalyzer(points, self.track_columns, self.moving_speed_kmh, self.max_speed_kmh,
+                             self.distance_method, elevation_smoothing=self.elevation_smoothing,
+                             elevation_window=self.elevation_window, gain_threshold_m=self.gain_threshold_m)
+
+    def iter_track_chunks(self, columns=None):
+        """Stream the master in chunks that never split a track
+
+        The rows of the last track of each chunk are held back and carried
+        into the next one, so each chunk has only whole tracks (as long as
+        a track's points are contiguous in the master). Memory use is one
+        chunk plus the longest track.
+        """
+        columns = list(dict.fromkeys((columns or ANALYSIS_COLUMNS) + self.track_columns))
+        carry = None
+        for chunk in iter_master(self.master, columns, self.chunk_size):
+            if carry is not None:
+                chunk = pd.concat([carry, chunk], ignore_index=True)
+            codes = chunk.groupby(self.track_columns, sort=False, observed=True).ngroup().to_numpy()
+            open_from = np.flatnonzero(codes != codes[-1])
+            open_from = open_from[-1] + 1 if len(open_from) else 0
+            carry = chunk.iloc[open_from:]
+            if open_from:
+                yield chunk.iloc[:open_from]
+        if carry is not None and len(carry):
+            yield carry
+
+    @property
+    def points(self):
+        """Master points needed for analysis, loaded on first use"""
+        if self._points is None:
+            if isinstance(self.master, pd.DataFrame):
+                points = self.master
+            else:
+                columns = list(dict.fromkeys(ANALYSIS_COLUMNS + self.track_columns))
+                points = read_master(self.master, columns=columns)
+            if not pd.api.types.is_datetime64_any_dtype(points['time']):
+                points = points.assign(time=pd.to_datetime(points['time'], utc=True,
+                                                           format='ISO8601', errors='coerce'))
+            self._points = points
+        return self._points
+
+    def _track_codes(self):
+        """Track number of every point, in order of first appearance"""
+        return self.points.groupby(self.track_columns, sort=False, observed=True).ngroup().to_numpy()
+
+    def _track_keys(self):
+        """Track key columns indexed by track number"""
+        return (self.points[self.track_columns]
+                .assign(track=self._track_codes())
+                .drop_duplicates('track').set_index('track'))
+
+    def segments(self):
+        """Consecutive-point segments of every track
+
+        Returns a DataFrame aligned with the track-ordered points: ``track``
+        code, cleaned ``elevation_m``, segment ``distance_m``, ``duration_s``
+        and ``climb_m`` (of the dead-banded profile) from the previous point
+        (NaN on each track's first point) and ``speed_kmh``.
+        """
+        points = self.points
+        codes = self._track_codes()
+        order = np.argsort(codes, kind='stable')
+        codes = codes[order]
+
+        latitude = points['latitude'].to_numpy(dtype=np.float64)[order]
+        longitude = points['longitude'].to_numpy(dtype=np.float64)[order]
+        altitude = points['altitude'].to_numpy(dtype=np.float64)[order]
+        times = points['time'].dt.tz_localize(None).to_numpy(dtype='datetime64[ns]')[order]
+        seconds = np.where(np.isnat(times), np.nan, times.view(np.int64) / 1e9)
+
+        distance = segment_distances(latitude, longitude, codes, method=self.distance_method)
+        duration = segment_diff(seconds, codes)
+        speed = segment_speeds(distance, duration)
+        elevation = clean_elevation(altitude, codes, np.nancumsum(distance),
+                                    self.elevation_smoothing, self.elevation_window)
+        climb = segment_diff(hysteresis(elevation, codes, self.gain_threshold_m), codes)
+
+        return pd.DataFrame({
+            'track': codes,
+            'elevation_m': elevation,
+            'distance_m': distance,
+            'duration_s': duration,
+            'climb_m': climb,
+            'speed_kmh': speed,
+            'seconds': seconds,
+        }, index=points.index[order])
+
+    def get_track_stats(self):
+        """Distance, duration, moving time, elevation, speed and extent per track
+
+        With a ``summary`` table (``route_statistics.csv`` written by the
+        master build) the statistics are read from it instead of the points.
+        In streaming mode each chunk's tracks are reduced to partial rows,
+        which are merged per track at the end (see ``TRACK_STAT_MERGE``).
+        """
+        if self._track_stats is not None:
+            return self._track_stats
+        if self.summary is not None:
+            self._track_stats = pd.read_csv(self.summary, parse_dates=['start_time', 'end_time'])
+            return self._track_stats
+        if self.streaming:
+            partials = [self._chunk_analyzer(chunk).get_track_stats() for chunk in self.iter_track_chunks()]
+            self._track_stats = merge_track_stats(partials, self.track_columns)
+            return self._track_stats
+
+        segments = self.segments()
+        valid_speed = segments['speed_kmh'].where(segments['speed_kmh'] <= self.max_speed_kmh)
+        moving = valid_speed >= self.moving_speed_kmh
+
+        stats = pd.DataFrame({
+            'track': segments['track'],
+            'distance_m': segments['distance_m'],
+            'moving_time_s': segments['duration_s'].where(moving),
+            'elevation_gain_m': segments['climb_m'].clip(lower=0),
+            'elevation_loss_m': -segments['climb_m'].clip(upper=0),
+            'max_speed_kmh': valid_speed,
+            'min_altitude': segments['elevation_m'],
+            'max_altitude': segments['elevation_m'],
+            'start': segments['seconds'],
+            'end': segments['seconds'],
+        }).groupby('track').agg({
+            'distance_m': 'sum',
+            'moving_time_s': 'sum',
+            'elevation_gain_m': 'sum',
+            'elevation_loss_m': 'sum',
+            'max_speed_kmh': 'max',
+            'min_altitude': 'min',
+            'max_altitude': 'max',
+            'start': 'min',
+            'end': 'max',
+        })
+
+        stats['points'] = np.bincount(segments['track'], minlength=len(stats))
+        stats['duration_s'] = stats.pop('end') - stats.pop('start')
+        stats['distance_km'] = stats.pop('distance_m') / 1000
+        with np.errstate(divide='ignore', invalid='ignore'):
+            stats['avg_speed_kmh'] = np.where(stats['moving_time_s'] > 0,
+                                              stats['distance_km'] / (stats['moving_time_s'] / 3600), np.nan)
+
+        # Extent of each track in space and time
+        extent = (self.points[['latitude', 'longitude', 'time']]
+                  .groupby(self._track_codes()).agg(['min', 'max']))
+        extent.columns = [f'{aggregate}_{column}' for column, aggregate in extent.columns]
+        extent = extent.rename(columns={'min_time': 'start_time', 'max_time': 'end_time'})
+
+        self._track_stats = self._track_keys().join(stats).join(extent)[self.track_columns + TRACK_STAT_COLUMNS]
+        self._track_stats = self._track_stats.reset_index(drop=True)
+        return self._track_stats
+
+    def get_transport_segments(self, **options):
+        """Stationary/walking/vehicle segments of every track
+
+        ``options`` are passed to ``segmentation.classify_modes``. Rows are
+        ``segmentation.mode_segments`` with the track key columns and the
+        start/end time of each segment added.
+        """
+        options.setdefault('stationary_kmh', self.moving_speed_kmh)
+        options.setdefault('max_speed_kmh', self.max_speed_kmh)
+        steps = self.segments()
+        modes = classify_modes(steps['distance_m'], steps['duration_s'], steps['track'], **options)
+        segments = mode_segments(modes, steps['distance_m'], steps['duration_s'], steps['track'])
+
+        times = self.points['time'].loc[steps.index]
+        segments['start_time'] = times.iloc[segments['start']].to_numpy()
+        segments['end_time'] = times.iloc[segments['end']].to_numpy()
+        keys = self._track_keys().reindex(segments['track'])
+        for column in reversed(self.track_columns):
+            segments.insert(0, column, keys[column].to_numpy())
+        return segments
+
+    @property
+    def spatial_index(self):
+        """Grid index of the master points
+
+        For a master file the persistent index next to it is opened (and
+        rebuilt if it is missing or stale) without loading the master.
+        """
+        if self._spatial_index is None:
+            if isinstance(self.master, pd.DataFrame):
+                keys = self._track_keys()
+                self._spatial_index = SpatialIndex.build(
+                    self.points['latitude'], self.points['longitude'], self._track_codes(),
+                    keys.itertuples(index=False, name=None), self.track_columns)
+            else:
+                self._spatial_index = open_spatial_index(self.master)
+        return self._spatial_index
+
+    def points_in_bbox(self, min_lat, min_lon, max_lat, max_lon):
+        """Master points inside a latitude/longitude box"""
+        return self.spatial_index.bbox(min_lat, min_lon, max_lat, max_lon)
+
+    def points_near(self, latitude, longitude, radius_m):
+        """Master points within ``radius_m`` of a location, nearest first"""
+        return self.spatial_index.radius(latitude, longitude, radius_m)
+
+    def nearest_points(self, latitude, longitude, k=1):
+        """The ``k`` master points closest to a location"""
+        return self.spatial_index.nearest(latitude, longitude, k)
+
+    def tracks_near(self, latitude, longitude, radius_m):
+        """Tracks passing within ``radius_m`` of a location"""
+        index = self.spatial_index
+        return index.tracks_in(index.radius(latitude, longitude, radius_m))
+
+    def get_density_grids(self, cell_size_m=DEFAULT_CELL_SIZE_M, levels=DEFAULT_LEVELS, max_gap_s=300.0):
+        """Point density at several resolutions, weighted by time spent and distance
+
+        Each point carries the segment leading to it: ``seconds`` and
+        ``distance_m`` per cell sum those segments (gaps over ``max_gap_s``
+        and implausible speeds are left out), and ``speed_kmh`` is the
+        cell's distance over its time. See ``density.density_grids``.
+        """
+        steps = self.segments()
+        usable = (steps['duration_s'] <= max_gap_s) & (steps['speed_kmh'] <= self.max_speed_kmh)
+        points = self.points.loc[steps.index]
+        grids = density_grids(points['latitude'], points['longitude'], {
+            'seconds': steps['duration_s'].where(usable),
+            'distance_m': steps['distance_m'].where(usable),
+        }, cell_size_m, levels)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            grids['speed_kmh'] = np.where(grids['seconds'] > 0, grids['distance_m'] / grids['seconds'] * 3.6, np.nan)
+        return grids
+
+    def get_column_stats(self, columns=('latitude', 'longitude', 'altitude'), by_track=False):
+        """Count, sum, mean, std, min and max of numeric master columns
+
+        One row per column, or per track and column with ``by_track``. In
+        streaming mode every chunk updates mergeable running statistics
+        (see ``core.aggregates``), so the master is read once and never
+        held in memory.
+        """
+        columns = list(columns)
+        running = {column: RunningStats() for column in columns}
+        if self.streaming:
+            chunks = iter_master(self.master, list(dict.fromkeys(columns + self.track_columns)), self.chunk_size)
+        else:
+            chunks = [self.points]
+        for chunk in chunks:
+            keys = [chunk[column] for column in self.track_columns] if by_track else None
+            for column in columns:
+                running[column].update(chunk[column], keys)
+
+        results = []
+        for column, stats in running.items():
+            result = stats.result()
+            if by_track:
+                result.index = result.index.set_names(self.track_columns)
+                result = result.reset_index()
+            result.insert(len(self.track_columns) if by_track else 0, 'column', column)
+            results.append(result)
+        return pd.concat(results, ignore_index=True)
+
+    def get_basic_stats(self):
+        """Dataset-wide totals and extremes"""
+        tracks = self.get_track_stats()
+        moving_h = tracks['moving_time_s'].sum() / 3600
+        distance_km = tracks['distance_km'].sum()
+        return {
+            'tracks': len(tracks),
+            'points': int(tracks['points'].sum()),
+            'total_distance_km': round(distance_km, 2),
+            'total_duration_h': round(tracks['duration_s'].sum() / 3600, 2),
+            'moving_time_h': round(moving_h, 2),
+            'elevation_gain_m': round(tracks['elevation_gain_m'].sum(), 1),
+            'elevation_loss_m': round(tracks['elevation_loss_m'].sum(), 1),
+            'max_speed_kmh': round(tracks['max_speed_kmh'].max(), 1),
+            'avg_moving_speed_kmh': round(distance_km / moving_h, 2) if moving_h else None,
+            'longest_track_km': round(tracks['distance_km'].max(), 2),
+        }
+
+
+def merge_track_stats(partials, track_columns=('source_file', 'track_name')):
+    """Combine partial per-track statistics of separate chunks
+
+    Rows of the same track are merged with ``TRACK_STAT_MERGE``; duration
+    and average speed are derived again from the merged values. Tracks
+    keep their order of first appearance.
+    """
+    track_columns = list(track_columns)
+    if not partials:
+        return pd.DataFrame(columns=track_columns + TRACK_STAT_COLUMNS)
+    stats = (pd.concat(partials, ignore_index=True)
+             .groupby(track_columns, sort=False, dropna=False).agg(TRACK_STAT_MERGE).reset_index())
+    stats['duration_s'] = (stats['end_time'] - stats['start_time']).dt.total_seconds()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        stats['avg_speed_kmh'] = np.where(stats['moving_time_s'] > 0,
+                                          stats['distance_km'] / (stats['moving_time_s'] / 3600), np.nan)
+    return stats[track_columns + TRACK_STAT_COLUMNS]
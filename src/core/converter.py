@@ -1,95 +1,248 @@
-from simplekml import Kml
-from pykml import parser
-import gpxpy
-import pandas as pd
+import numpy as np
 import os
+from itertools import groupby
+from operator import itemgetter
 
+from .readers import iter_gpx_chunks, iter_kml_chunks, iter_kml_linestrings
+from .simplify import reduction_ratio, simplify_df, simplify_mask
+from .writers import GpxWriter, KmlWriter
 
-def df_to_kml(df, output_path):
-    """Save DataFrame to KML file"""
-    kml = Kml()
-    for name, group in df.groupby('placemark'):
-        linestring = kml.newlinestring(name=name)
-        linestring.coords = [(row['longitude'], row['latitude'], row['altitude'])
-                             for _, row in group.iterrows()]
-    kml.save(output_path)
-
-
-def kml_to_df(kml_file):
-    """Convert KML to DataFrame"""
-    with open(kml_file) as f:
-        doc = parser.parse(f).getroot()
-
-    coordinates = []
-    for pm in doc.Document.Placemark:
-        if hasattr(pm, 'LineString'):
-            coords = str(pm.LineString.coordinates).split()
-            for coord in coords:
-                lon, lat, alt = map(float, coord.split(','))
-                coordinates.append({
-                    'placemark': str(pm.name),
-                    'longitude': lon,
-                    'latitude': lat,
-                    'altitude': alt,
-                    'source_file': os.path.basename(kml_file)
-                })
-    return pd.DataFrame(coordinates)
-
-
-def gpx_to_df(gpx_file):
-    """Convert GPX to DataFrame with missing altitude handling"""
-    with open(gpx_file) as f:
-        gpx = gpxpy.parse(f)
-
-    points = []
-    for track in gpx.tracks:
-        for segment in track.segments:
-            for point in segment.points:
-                points.append({
-                    'placemark': track.name if track.name else os.path.basename(gpx_file),
-                    'latitude': point.latitude,
-                    'longitude': point.longitude,
-                    'altitude': point.elevation if point.elevation is not None else 0.0,
-                    'time': point.time.isoformat() if point.time else None,
-                    'source_file': os.path.basename(gpx_file)
-                })
-    return pd.DataFrame(points)
-
-
-def df_to_gpx(df, output_path, track_name="Converted Track"):
-    """Convert DataFrame to GPX file"""
-    gpx = gpxpy.gpx.GPX()
-    gpx_track = gpxpy.gpx.GPXTrack(name=track_name)
-    gpx.tracks.append(gpx_track)
-    
-    gpx_segment = gpxpy.gpx.GPXTrackSegment()
-    gpx_track.segments.append(gpx_segment)
-    
-    for _, row in df.iterrows():
-        point = gpxpy.gpx.GPXTrackPoint(
-            latitude=row['latitude'],
-            longitude=row['longitude'],
-            elevation=row['altitude'] if pd.notna(row['altitude']) else 0.0
-        )
-        if pd.notna(row.get('time')):
-            point.time = pd.to_datetime(row['time'])
-        gpx_segment.points.append(point)
-    
-    with open(output_path, 'w') as f:
-        f.write(gpx.to_xml())
-
-
-def convert_gpx_to_kml(input_path, output_path):
-    """Convert GPX → KML"""
-    df = gpx_to_df(input_path)
-    df_to_kml(df, output_path)
-    return output_path
-
-
-def convert_kml_to_gpx(input_path, output_path, track_name=None):
-    """Convert KML → GPX"""
-    df = kml_to_df(input_path)
+# pandas is imported inside the DataFrame functions only: the streaming
+# conversions do not need it, and importing it dominates CLI startup time.
+
+
+def _simplified(df, tolerance_m, group_columns, method):
+    """Simplify each group of ``df`` and report the reduction ratio"""
+    simplified = simplify_df(df, tolerance_m, group_columns, method)
+    print(f"Simplified ({method}, {tolerance_m} m): {len(df):,} -> {len(simplified):,} points "
+          f"({reduction_ratio(len(df), len(simplified)):.1f}x fewer)")
+    return simplified
+
+
+def df_to_kml(df, output_path, simplify_tolerance=None, simplify_method='douglas-peucker'):
+    """Save DataFrame to KML file
+
+    With ``simplify_tolerance`` (meters) each placemark is simplified first.
+    """
+    import pandas as pd
+    if simplify_tolerance:
+        df = _simplified(df, simplify_tolerance, ['placemark'], simplify_method)
+    codes, names = pd.factorize(df['placemark'], sort=True)
+    order = np.argsort(codes, kind='stable')
+    sorted_codes = codes[order]
+    starts = np.searchsorted(sorted_codes, np.arange(len(names)), side='left')
+    ends = np.searchsorted(sorted_codes, np.arange(len(names)), side='right')
+
+    longitude = df['longitude'].to_numpy(dtype=np.float64)[order]
+    latitude = df['latitude'].to_numpy(dtype=np.float64)[order]
+    altitude = df['altitude'].to_numpy(dtype=np.float64)[order]
+
+    with KmlWriter(output_path) as writer:
+        for name, start, end in zip(names, starts, ends):
+            writer.write_placemark(name, longitude[start:end], latitude[start:end], altitude[start:end])
+
+
+def kml_to_df(kml_file, source_file=None):
+    """Convert KML to DataFrame (missing altitude is NaN)
+
+    ``kml_file`` is a path or a binary file object; ``source_file``
+    (default: the file name) names the file in the result.
+    """
+    import pandas as pd
+    source_file = source_file or os.path.basename(kml_file)
+    names, counts = [], []
+    longitudes, latitudes, altitudes = [], [], []
+
+    for name, columns in iter_kml_linestrings(kml_file):
+        names.append(name if name is not None else source_file)
+        counts.append(len(columns['longitude']))
+        longitudes.append(columns['longitude'])
+        latitudes.append(columns['latitude'])
+        altitudes.append(columns['altitude'])
+
+    if not counts:
+        return pd.DataFrame(columns=['placemark', 'longitude', 'latitude', 'altitude', 'source_file'])
+
+    categories, codes = np.unique(np.array(names, dtype=object), return_inverse=True)
+    altitude = np.concatenate(altitudes)
+    total = int(np.sum(counts))
+    return pd.DataFrame({
+        'placemark': pd.Categorical.from_codes(np.repeat(codes, counts), categories=categories),
+        'longitude': np.concatenate(longitudes),
+        'latitude': np.concatenate(latitudes),
+        'altitude': altitude,
+        'source_file': pd.Categorical.from_codes(np.zeros(total, dtype=np.int8), categories=[source_file])
+    })
+
+
+def gpx_to_df(gpx_file, source_file=None):
+    """Convert GPX to DataFrame (missing altitude is NaN)
+
+    ``gpx_file`` is a path or a binary file object; ``source_file``
+    (default: the file name) names the file in the result.
+    """
+    import pandas as pd
+    source_file = source_file or os.path.basename(gpx_file)
+    names, counts = [], []
+    latitudes, longitudes, altitudes, times = [], [], [], []
+
+    for track, columns in iter_gpx_chunks(gpx_file):
+        names.append(track['name'] if track['name'] else source_file)
+        counts.append(len(columns['latitude']))
+        latitudes.append(columns['latitude'])
+        longitudes.append(columns['longitude'])
+        altitudes.append(columns['altitude'])
+        times.extend(columns['time'])
+
+    if not counts:
+        return pd.DataFrame(columns=['placemark', 'latitude', 'longitude', 'altitude', 'time', 'source_file'])
+
+    altitude = np.concatenate(altitudes)
+    return pd.DataFrame({
+        'placemark': np.repeat(np.array(names, dtype=object), counts),
+        'latitude': np.concatenate(latitudes),
+        'longitude': np.concatenate(longitudes),
+        'altitude': altitude,
+        'time': np.array(times, dtype=object),
+        'source_file': source_file
+    })
+
+
+def df_to_gpx(df, output_path, track_name="Converted Track", track_column=None, segment_column=None,
+              simplify_tolerance=None, simplify_method='douglas-peucker'):
+    """Convert DataFrame to GPX file
+
+    Without ``track_column`` all points form one track named ``track_name``;
+    otherwise each value of ``track_column`` becomes a track, split into
+    segments by ``segment_column`` if given. Groups keep their order of
+    first appearance and points are written in chunks. With
+    ``simplify_tolerance`` (meters) each segment is simplified first.
+    """
+    import pandas as pd
+    if simplify_tolerance:
+        groups = [column for column in (track_column, segment_column) if column]
+        df = _simplified(df, simplify_tolerance, groups, simplify_method)
+    latitude = df['latitude'].to_numpy(dtype=np.float64)
+    longitude = df['longitude'].to_numpy(dtype=np.float64)
+    elevation = df['altitude'].to_numpy(dtype=np.float64)
+    if 'time' in df.columns:
+        times = pd.to_datetime(df['time'], utc=True, format='ISO8601', errors='coerce')
+        times = times.dt.tz_convert(None).to_numpy()
+    else:
+        times = np.full(len(df), np.datetime64('NaT'), dtype='datetime64[ns]')
+
+    if track_column:
+        track_codes, track_names = pd.factorize(df[track_column])
+    else:
+        track_codes, track_names = np.zeros(len(df), dtype=np.intp), [track_name]
+    if segment_column:
+        segment_codes = pd.factorize(df[segment_column])[0]
+    else:
+        segment_codes = np.zeros(len(df), dtype=np.intp)
+
+    order = np.lexsort((segment_codes, track_codes))
+    sorted_tracks = track_codes[order]
+    starts = np.searchsorted(sorted_tracks, np.arange(len(track_names)), side='left')
+    ends = np.searchsorted(sorted_tracks, np.arange(len(track_names)), side='right')
+
+    with GpxWriter(output_path) as writer:
+        for name, start, end in zip(track_names, starts, ends):
+            rows = order[start:end]
+            bounds = np.flatnonzero(np.diff(segment_codes[rows])) + 1
+            writer.begin_track(name)
+            for segment in np.split(rows, bounds):
+                writer.begin_segment()
+                writer.write_points(latitude[segment], longitude[segment], elevation[segment], times[segment])
+                writer.end_segment()
+            writer.end_track()
+
+
+def _counted(chunks, counter):
+    """Pass ``(key, columns)`` chunks through, counting their points"""
+    for key, columns in chunks:
+        counter['points'] += len(columns['latitude'])
+        yield key, columns
+
+
+def _simplified_chunks(chunks, tolerance_m, method):
+    """Simplify a stream of ``(key, columns)`` chunks one key at a time
+
+    Chunks of one key (a track or LineString) must be consecutive. Only the
+    key being simplified is held in memory; each yields a single chunk.
+    """
+    before = after = 0
+    for key, group in groupby(chunks, key=itemgetter(0)):
+        parts = [columns for _, columns in group]
+        columns = {name: np.concatenate([np.asarray(part[name], dtype=object if name == 'time' else np.float64)
+                                         for part in parts])
+                   for name in parts[0]}
+        keep = simplify_mask(columns['latitude'], columns['longitude'], tolerance_m, method=method)
+        before += len(keep)
+        after += int(keep.sum())
+        yield key, {name: values[keep] for name, values in columns.items()}
+    print(f"Simplified ({method}, {tolerance_m} m): {before:,} -> {after:,} points "
+          f"({reduction_ratio(before, after):.1f}x fewer)")
+
+
+def convert_gpx_to_kml(input_path, output_path, simplify_tolerance=None, simplify_method='douglas-peucker'):
+    """Convert GPX → KML, returning the number of points read
+
+    Points stream from the reader to the writer chunk by chunk, so memory
+    stays bounded whatever the file size. Every <trk> becomes one
+    placemark, in file order. With ``simplify_tolerance`` (meters) one
+    track at a time is held and simplified.
+    """
+    source_file = os.path.basename(input_path)
+    counter = {'points': 0}
+    chunks = _counted(iter_gpx_chunks(input_path), counter)
+    if simplify_tolerance:
+        chunks = _simplified_chunks(chunks, simplify_tolerance, simplify_method)
+
+    with KmlWriter(output_path) as writer:
+        current = None
+        for track, columns in chunks:
+            if track is not current:
+                if current is not None:
+                    writer.end_placemark()
+                writer.begin_placemark(track['name'] if track['name'] else source_file)
+                current = track
+            writer.write_coordinates(columns['longitude'], columns['latitude'], columns['altitude'])
+        if current is not None:
+            writer.end_placemark()
+    return counter['points']
+
+
+def convert_kml_to_gpx(input_path, output_path, track_name=None, simplify_tolerance=None,
+                       simplify_method='douglas-peucker'):
+    """Convert KML → GPX, returning the number of points read
+
+    Streams like ``convert_gpx_to_kml``: every placemark becomes a <trk>
+    and each of its LineStrings a <trkseg>. Placemarks without a name use
+    ``track_name`` (default "Converted from <file>").
+    """
     if not track_name:
         track_name = f"Converted from {os.path.basename(input_path)}"
-    df_to_gpx(df, output_path, track_name)
-    return output_path
+    counter = {'points': 0}
+    chunks = _counted(iter_kml_chunks(input_path), counter)
+    if simplify_tolerance:
+        chunks = _simplified_chunks(chunks, simplify_tolerance, simplify_method)
+
+    with GpxWriter(output_path) as writer:
+        placemark = line = None
+        for piece, columns in chunks:
+            if piece is not line:
+                if line is not None:
+                    writer.end_segment()
+                if piece['placemark'] != placemark:
+                    if placemark is not None:
+                        writer.end_track()
+                    writer.begin_track(piece['name'] if piece['name'] else track_name)
+                    placemark = piece['placemark']
+                writer.begin_segment()
+                line = piece
+            writer.write_points(columns['latitude'], columns['longitude'], columns['altitude'],
+                                [None] * len(columns['latitude']))
+        if line is not None:
+            writer.end_segment()
+            writer.end_track()
+    return counter['points']
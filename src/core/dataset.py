@@ -0,0 +1,121 @@
+"""Loading the master dataset in any of its formats
+
+The master is written as CSV (``gps_master.csv``) and optionally as a typed
+Parquet or Arrow IPC/Feather dataset next to it. Parquet/Feather need
+pyarrow. The master build also keeps a per-track summary table
+(``route_statistics.csv``) in the same directory.
+
+``iter_master`` reads any of the formats in bounded row chunks for
+out-of-core analysis; datasets are written in row groups/record batches of
+``DATASET_BATCH_ROWS`` so that no chunk needs more than one of them.
+"""
+import os
+
+import pandas as pd
+
+DATASET_EXTENSIONS = ('.parquet', '.feather', '.arrow')
+SUMMARY_NAME = 'route_statistics.csv'
+DEFAULT_CHUNK_ROWS = 1_000_000
+DATASET_BATCH_ROWS = 1_000_000
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError as e:
+        raise ImportError("Parquet/Feather master datasets require pyarrow (pip install pyarrow)") from e
+
+
+def default_master_path(output_dir, name='gps_master'):
+    """Path of the master in ``output_dir``, preferring a typed dataset over CSV
+
+    A typed dataset older than the CSV is stale (the CSV was rebuilt
+    without it) and is skipped.
+    """
+    csv_path = os.path.join(output_dir, name + '.csv')
+    csv_mtime = os.path.getmtime(csv_path) if os.path.exists(csv_path) else None
+    for extension in DATASET_EXTENSIONS:
+        path = os.path.join(output_dir, name + extension)
+        if os.path.exists(path) and (csv_mtime is None or os.path.getmtime(path) >= csv_mtime):
+            return path
+    return csv_path
+
+
+def summary_path_for(master_path):
+    """Path of the per-track summary table kept next to a master"""
+    return os.path.join(os.path.dirname(master_path), SUMMARY_NAME)
+
+
+def current_summary_path(master_path):
+    """The master's summary table, or None if it is missing or older than the master"""
+    path = summary_path_for(master_path)
+    if os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(master_path):
+        return path
+    return None
+
+
+def read_master(path, columns=None):
+    """Load the master dataset, reading only ``columns`` if given
+
+    The format follows the file extension. Parquet and Feather keep their
+    stored dtypes (datetime ``time``, categorical track attributes); column
+    projection means unread columns are never decoded.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    columns = list(columns) if columns is not None else None
+
+    if extension == '.parquet':
+        _require_pyarrow()
+        return pd.read_parquet(path, columns=columns)
+    if extension in ('.feather', '.arrow'):
+        _require_pyarrow()
+        return pd.read_feather(path, columns=columns)
+    return pd.read_csv(path, usecols=columns)
+
+
+def iter_master(path, columns=None, chunk_size=DEFAULT_CHUNK_ROWS):
+    """Stream the master dataset as DataFrames of at most ``chunk_size`` rows
+
+    Rows come in file order and only ``columns`` are read. Parquet is read
+    batch by batch from its row groups and Feather through a memory map,
+    so memory use follows the chunk size rather than the dataset size.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    columns = list(columns) if columns is not None else None
+
+    if extension == '.parquet':
+        _require_pyarrow()
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size, columns=columns):
+            yield batch.to_pandas()
+    elif extension in ('.feather', '.arrow'):
+        _require_pyarrow()
+        import pyarrow as pa
+        with pa.memory_map(path) as source:
+            reader = pa.ipc.open_file(source)
+            for i in range(reader.num_record_batches):
+                batch = reader.get_batch(i)
+                if columns is not None:
+                    batch = batch.select(columns)
+                for start in range(0, batch.num_rows, chunk_size):
+                    yield batch.slice(start, chunk_size).to_pandas()
+    else:
+        yield from pd.read_csv(path, usecols=columns, chunksize=chunk_size)
+
+
+def write_master_dataset(df, path):
+    """Write a typed master frame as Parquet or Arrow IPC/Feather
+
+    Categorical columns are stored dictionary-encoded, in row groups or
+    record batches of ``DATASET_BATCH_ROWS`` rows.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in DATASET_EXTENSIONS:
+        raise ValueError(f"Unsupported dataset format: {path} (use one of {', '.join(DATASET_EXTENSIONS)})")
+    _require_pyarrow()
+
+    if extension == '.parquet':
+        df.to_parquet(path, index=False, row_group_size=DATASET_BATCH_ROWS)
+    else:
+        df.reset_index(drop=True).to_feather(path, chunksize=DATASET_BATCH_ROWS)
+    return path
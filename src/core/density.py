@@ -0,0 +1,71 @@
+"""Multi-resolution density grids over master points
+
+Points are binned into square cells of a base size on the same
+equirectangular grid as the spatial index, and every coarser level is a
+whole multiple of it. Each level is one vectorized histogram over
+integer cell keys (``np.unique`` plus weighted ``np.bincount``), so only
+occupied cells are stored and the extent of the data does not matter.
+
+The result is a long table with one row per occupied cell and level:
+``cell_size_m``, the cell centre ``latitude``/``longitude``, the number
+of ``points`` and the sum of each weight. It is small enough for plots
+to render heatmaps from directly.
+"""
+import numpy as np
+import pandas as pd
+
+from .geodesy import EARTH_RADIUS_M
+from .spatial import _grid_cells
+
+DEFAULT_CELL_SIZE_M = 50.0
+# Level sizes as multiples of the base cell: 50 m, 200 m and 1 km by default
+DEFAULT_LEVELS = (1, 4, 20)
+
+
+def density_grid(latitude, longitude, cell_size_m, weights=None, reference_latitude=None):
+    """Occupied cells of one grid level with point counts and weight sums
+
+    ``weights`` maps output column names to per-point arrays; NaN weights
+    count as zero.
+    """
+    latitude = np.asarray(latitude, dtype=np.float64)
+    longitude = np.asarray(longitude, dtype=np.float64)
+    weights = weights or {}
+    valid = np.isfinite(latitude) & np.isfinite(longitude)
+    if reference_latitude is None:
+        reference_latitude = float(np.mean(latitude[valid])) if valid.any() else 0.0
+    scale = np.cos(np.radians(reference_latitude))
+
+    cx, cy = _grid_cells(latitude[valid], longitude[valid], scale, cell_size_m)
+    # One integer key per cell, so the histogram is a 1-D unique + bincount
+    x0 = cx.min() if len(cx) else 0
+    y0 = cy.min() if len(cy) else 0
+    height = (cy.max() - y0 + 1) if len(cy) else 1
+    keys, inverse = np.unique((cx - x0) * height + (cy - y0), return_inverse=True)
+
+    # Cell centres back in degrees
+    centre_x = (keys // height + x0 + 0.5) * cell_size_m
+    centre_y = (keys % height + y0 + 0.5) * cell_size_m
+    grid = pd.DataFrame({
+        'cell_size_m': cell_size_m,
+        'latitude': np.degrees(centre_y / EARTH_RADIUS_M),
+        'longitude': np.degrees(centre_x / (EARTH_RADIUS_M * scale)),
+        'points': np.bincount(inverse, minlength=len(keys)),
+    })
+    for name, values in weights.items():
+        values = np.nan_to_num(np.asarray(values, dtype=np.float64)[valid])
+        grid[name] = np.bincount(inverse, weights=values, minlength=len(keys))
+    return grid
+
+
+def density_grids(latitude, longitude, weights=None, cell_size_m=DEFAULT_CELL_SIZE_M, levels=DEFAULT_LEVELS):
+    """Density grids at several resolutions, stacked in one table
+
+    Level sizes are ``cell_size_m`` times each entry of ``levels``. All
+    levels share one reference latitude, so their cells nest exactly.
+    """
+    latitude = np.asarray(latitude, dtype=np.float64)
+    valid = np.isfinite(latitude)
+    reference = float(np.mean(latitude[valid])) if valid.any() else 0.0
+    grids = [density_grid(latitude, longitude, cell_size_m * level, weights, reference) for level in levels]
+    return pd.concat(grids, ignore_index=True)
@@ -0,0 +1,203 @@
+"""Track-level duplicate detection
+
+The same hike often arrives several times (a GPX export, the KML of the
+same route, again inside a full backup) with different precision or
+timestamps, so point-level deduplication misses it. Tracks are compared
+in two stages:
+
+1. Cheap fingerprints prune candidates: bounding box and start/end points
+   are compared against all accepted tracks at once (two tracks within
+   Fréchet distance d have all of these within d), and tracks with the
+   same hash of their coarsely simplified shape are tried first.
+2. Candidates are confirmed with a bounded discrete Fréchet check on
+   tracks resampled at even spacing: "is the Fréchet distance at most
+   ``tolerance_m``", answered row by row with an early exit.
+
+Two tracks whose start times are both known and differ by more than
+``time_tolerance_s`` are separate recordings of the same route, not
+duplicates.
+"""
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+from .geodesy import EARTH_RADIUS_M
+from .simplify import douglas_peucker
+
+# Cap on resampled points per track for the Fréchet check
+MAX_SHAPE_POINTS = 400
+
+
+def _resample(x, y, count):
+    """``count`` points evenly spaced along the polyline"""
+    distance = np.concatenate([[0.0], np.cumsum(np.hypot(np.diff(x), np.diff(y)))])
+    at = np.linspace(0.0, distance[-1], count)
+    return np.interp(at, distance, x), np.interp(at, distance, y)
+
+
+def _seconds(time):
+    """Epoch seconds of a timestamp (naive means UTC), NaN if missing"""
+    if time is None or pd.isna(time):
+        return np.nan
+    time = pd.Timestamp(time)
+    if time.tzinfo is None:
+        time = time.tz_localize('UTC')
+    return time.timestamp()
+
+
+def frechet_within(a, b, tolerance):
+    """Whether the discrete Fréchet distance of two polylines is at most ``tolerance``
+
+    ``a`` and ``b`` are (n, 2) arrays. Uses the decision form of the
+    dynamic program: row i of the reachable free space is computed from
+    row i-1 in one vectorized step (reachability spreads right along runs
+    of close points), and the check stops as soon as a row is empty.
+    """
+    tolerance2 = tolerance * tolerance
+    if ((a[0] - b[0]) ** 2).sum() > tolerance2 or ((a[-1] - b[-1]) ** 2).sum() > tolerance2:
+        return False
+
+    m = len(b)
+    positions = np.arange(m)
+    reach = None
+    for point in a:
+        close = ((b - point) ** 2).sum(axis=1) <= tolerance2
+        if reach is None:
+            # First row: reachable along the run of close points from b[0]
+            reach = close & (np.cumsum(~close) == 0)
+        else:
+            seeded = close & (reach | np.r_[False, reach[:-1]])
+            # Spread each seed right until the run of close points ends
+            run_start = np.maximum.accumulate(np.where(~close, positions + 1, 0))
+            last_seed = np.maximum.accumulate(np.where(seeded, positions, -1))
+            reach = close & (last_seed >= run_start)
+        if not reach.any():
+            return False
+    return bool(reach[-1])
+
+
+class TrackMatcher:
+    """Registry of accepted tracks that recognises later duplicates
+
+    Call ``match`` for each incoming track and ``add`` the ones that are
+    kept; ``match`` returns the key of the accepted track it duplicates.
+    """
+
+    def __init__(self, tolerance_m=25.0, time_tolerance_s=120.0):
+        self.tolerance_m = tolerance_m
+        self.time_tolerance_s = time_tolerance_s
+        self.reference = None
+        self.keys = []
+        self.features = []
+        self.start_times = []
+        self.shapes = []
+        self.shape_hashes = {}
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _prepare(self, latitude, longitude):
+        latitude = np.asarray(latitude, dtype=np.float64)
+        longitude = np.asarray(longitude, dtype=np.float64)
+        valid = np.isfinite(latitude) & np.isfinite(longitude)
+        latitude, longitude = latitude[valid], longitude[valid]
+        if len(latitude) < 2:
+            return None
+        if self.reference is None:
+            self.reference = np.cos(np.radians(latitude[0]))
+        x = EARTH_RADIUS_M * np.radians(longitude) * self.reference
+        y = EARTH_RADIUS_M * np.radians(latitude)
+
+        # Fingerprints: bbox, start and end point, coarse shape hash
+        features = np.array([x.min(), y.min(), x.max(), y.max(), x[0], y[0], x[-1], y[-1]])
+        starts = np.zeros(len(x), dtype=bool)
+        starts[0] = True
+        coarse = douglas_peucker(x, y, 2 * self.tolerance_m, starts)
+        outline = np.column_stack(_resample(x[coarse], y[coarse], 9))
+        cells = np.round(outline / (4 * self.tolerance_m)).astype(np.int64)
+        shape_hash = hashlib.md5(cells.tobytes()).hexdigest()
+
+        # Even spacing of half the tolerance keeps discrete Fréchet close to continuous
+        length = np.hypot(np.diff(x), np.diff(y)).sum()
+        count = int(np.clip(np.ceil(length / (self.tolerance_m / 2)) + 1, 2, MAX_SHAPE_POINTS))
+        shape = np.column_stack(_resample(x, y, count))
+        return features, shape_hash, shape
+
+    def _candidates(self, features, shape_hash, start_time):
+        if not self.keys:
+            return []
+        accepted = np.array(self.features)
+        close = (np.abs(accepted - features) <= self.tolerance_m).all(axis=1)
+        gap = np.abs(np.array(self.start_times) - _seconds(start_time))
+        close &= ~(gap > self.time_tolerance_s)
+        same_shape = np.zeros(len(close), dtype=bool)
+        same_shape[self.shape_hashes.get(shape_hash, [])] = True
+        candidates = np.flatnonzero(close)
+        return candidates[np.argsort(~same_shape[candidates], kind='stable')].tolist()
+
+    def match(self, latitude, longitude, start_time=None):
+        """Key of an accepted track this one duplicates, or None"""
+        prepared = self._prepare(latitude, longitude)
+        if prepared is None:
+            return None
+        features, shape_hash, shape = prepared
+        for i in self._candidates(features, shape_hash, start_time):
+            if frechet_within(shape, self.shapes[i], self.tolerance_m):
+                return self.keys[i]
+        return None
+
+    def add(self, key, latitude, longitude, start_time=None):
+        """Accept a track so later duplicates of it are recognised"""
+        prepared = self._prepare(latitude, longitude)
+        if prepared is None:
+            return
+        features, shape_hash, shape = prepared
+        self.shape_hashes.setdefault(shape_hash, []).append(len(self.keys))
+        self.keys.append(key)
+        self.features.append(features)
+        self.start_times.append(_seconds(start_time))
+        self.shapes.append(shape)
+
+
+def find_duplicate_tracks(df, track_columns, tolerance_m=25.0, time_tolerance_s=120.0, matcher=None):
+    """Tracks of ``df`` that duplicate an earlier track
+
+    Tracks are taken in order of first appearance; the first of a set of
+    duplicates is kept. Returns one row per duplicate with its key columns
+    and ``duplicate_of`` (the key tuple of the kept track).
+    """
+    track_columns = list(track_columns)
+    if matcher is None:
+        matcher = TrackMatcher(tolerance_m, time_tolerance_s)
+    codes = df.groupby(track_columns, sort=False, observed=True, dropna=False).ngroup().to_numpy()
+    order = np.argsort(codes, kind='stable')
+    bounds = np.searchsorted(codes[order], np.arange(codes.max() + 2 if len(codes) else 1))
+    latitude = df['latitude'].to_numpy(dtype=np.float64)[order]
+    longitude = df['longitude'].to_numpy(dtype=np.float64)[order]
+    if 'time' in df.columns:
+        times = pd.to_datetime(df['time'], utc=True, format='ISO8601', errors='coerce')
+        start_times = times.groupby(codes).min().to_numpy()
+    else:
+        start_times = np.full(len(bounds) - 1, None)
+    keys = df[track_columns].to_numpy(dtype=object)[order]
+
+    duplicates = []
+    for start, end, start_time in zip(bounds[:-1], bounds[1:], start_times):
+        key = tuple(keys[start])
+        original = matcher.match(latitude[start:end], longitude[start:end], start_time)
+        if original is None:
+            matcher.add(key, latitude[start:end], longitude[start:end], start_time)
+        else:
+            duplicates.append(key + (original,))
+    return pd.DataFrame(duplicates, columns=track_columns + ['duplicate_of'])
+
+
+def drop_duplicate_tracks(df, track_columns, tolerance_m=25.0, time_tolerance_s=120.0):
+    """``df`` without the points of duplicate tracks, and the duplicates table"""
+    duplicates = find_duplicate_tracks(df, track_columns, tolerance_m, time_tolerance_s)
+    if duplicates.empty:
+        return df, duplicates
+    dropped = pd.MultiIndex.from_frame(duplicates[list(track_columns)])
+    keep = ~pd.MultiIndex.from_frame(df[list(track_columns)]).isin(dropped)
+    return df[keep], duplicates
@@ -0,0 +1,129 @@
+"""Elevation cleaning and gain/loss
+
+Missing elevations are NaN, never 0.0. Every step works on all tracks at
+once, given a per-point track key with each track's points contiguous:
+
+1. ``interpolate_gaps`` fills NaN runs linearly between the nearest valid
+   points of the same track (track edges take the nearest valid value).
+2. ``smooth`` applies a centred rolling mean or Savitzky-Golay filter;
+   windows are padded with the track's edge values and never cross tracks.
+3. ``hysteresis`` passes the profile through a dead band of
+   ``threshold_m``, so oscillations smaller than that add no gain or loss.
+"""
+import numpy as np
+
+from .geodesy import track_starts
+
+SMOOTHING_METHODS = ('rolling', 'savgol')
+
+
+def _point_bounds(starts):
+    """First and last index of each point's own track"""
+    track = np.cumsum(starts) - 1
+    first = np.flatnonzero(starts)
+    last = np.append(first[1:], len(starts)) - 1
+    return first[track], last[track]
+
+
+def interpolate_gaps(altitude, groups=None, position=None):
+    """Fill missing elevations from the surrounding valid points of the track
+
+    ``position`` is the interpolation axis (e.g. cumulative distance);
+    point order is used if not given. Tracks without any elevation stay NaN.
+    """
+    altitude = np.asarray(altitude, dtype=np.float64)
+    n = len(altitude)
+    if n == 0:
+        return altitude.copy()
+    index = np.arange(n)
+    position = index if position is None else np.asarray(position, dtype=np.float64)
+    first, last = _point_bounds(track_starts(groups, n))
+
+    valid = np.isfinite(altitude)
+    previous = np.maximum.accumulate(np.where(valid, index, -1))
+    following = np.minimum.accumulate(np.where(valid, index, n)[::-1])[::-1]
+    has_previous = previous >= first
+    has_following = following <= last
+    previous = np.clip(previous, 0, n - 1)
+    following = np.clip(following, 0, n - 1)
+
+    span = position[following] - position[previous]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        fraction = np.where(span > 0, (position - position[previous]) / span, 0.0)
+    between = altitude[previous] + fraction * (altitude[following] - altitude[previous])
+    filled = np.where(has_previous & has_following, between,
+                      np.where(has_previous, altitude[previous],
+                               np.where(has_following, altitude[following], np.nan)))
+    return np.where(valid, altitude, filled)
+
+
+def savgol_coefficients(window, polyorder):
+    """Savitzky-Golay weights for the centre of a ``window``-point fit of degree ``polyorder``"""
+    if polyorder >= window:
+        raise ValueError(f"polyorder ({polyorder}) must be less than window ({window})")
+    offsets = np.arange(window) - window // 2
+    return np.linalg.pinv(np.vander(offsets, polyorder + 1, increasing=True))[0]
+
+
+def smooth(altitude, groups=None, method='rolling', window=5, polyorder=2):
+    """Centred rolling-mean or Savitzky-Golay smoothing within each track
+
+    ``window`` is an odd number of points. The filter is one weighted sum
+    per window offset over all points, with indices clipped to the track.
+    """
+    altitude = np.asarray(altitude, dtype=np.float64)
+    if method is None or window <= 1 or len(altitude) == 0:
+        return altitude.copy()
+    if method not in SMOOTHING_METHODS:
+        raise ValueError(f"Unknown smoothing method: {method} (use one of {', '.join(SMOOTHING_METHODS)})")
+    if window % 2 == 0:
+        raise ValueError(f"Smoothing window must be odd, got {window}")
+
+    if method == 'savgol':
+        weights = savgol_coefficients(window, polyorder)
+    else:
+        weights = np.full(window, 1.0 / window)
+    first, last = _point_bounds(track_starts(groups, len(altitude)))
+    index = np.arange(len(altitude))
+    smoothed = np.zeros(len(altitude))
+    for offset, weight in zip(range(-(window // 2), window // 2 + 1), weights):
+        smoothed += weight * altitude[np.clip(index + offset, first, last)]
+    return smoothed
+
+
+def hysteresis(altitude, groups=None, threshold_m=3.0):
+    """Profile that only moves once elevation leaves a ``threshold_m`` dead band
+
+    Each point clamps the running level to within ``threshold_m / 2`` of
+    its elevation (a play operator). A composition of clamps is again a
+    clamp, so the running level of every point is an inclusive scan of
+    (low, high) pairs, computed in log2(n) vectorized doubling steps. A
+    track's first point clamps to a constant, which restarts the scan.
+    NaN points leave the level unchanged; interpolate gaps first.
+    """
+    altitude = np.asarray(altitude, dtype=np.float64)
+    n = len(altitude)
+    half = threshold_m / 2
+    starts = track_starts(groups, n)
+    missing = ~np.isfinite(altitude)
+    low = np.where(missing, -np.inf, altitude - half)
+    high = np.where(missing, np.inf, altitude + half)
+    # Start level: the track's first valid elevation (any constant for tracks without one)
+    filled = interpolate_gaps(altitude, groups)
+    low[starts] = high[starts] = np.nan_to_num(filled[starts])
+
+    step = 1
+    while step < n:
+        # Apply earlier composition (low, high)[i - step] before [i]
+        earlier_low, earlier_high = low[:-step], high[:-step]
+        current_low, current_high = low[step:], high[step:]
+        low[step:], high[step:] = (np.minimum(np.maximum(earlier_low, current_low), current_high),
+                                   np.minimum(np.maximum(earlier_high, current_low), current_high))
+        step *= 2
+    return np.where(np.isnan(filled), np.nan, low)
+
+
+def clean_elevation(altitude, groups=None, position=None, method='rolling', window=5, polyorder=2):
+    """Interpolated and smoothed elevation profile of every track"""
+    filled = interpolate_gaps(altitude, groups, position)
+    return smooth(filled, groups, method, window, polyorder)
@@ -1,49 +1,93 @@
 import os
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
 from .converter import gpx_to_df, kml_to_df
+from .duplicates import drop_duplicate_tracks
+from .sources import RouteSource, close_archives, list_route_sources
+
+
+def _load_route_file(source):
+    """Parse one GPX/KML file, returning (filename, DataFrame or None, error message)
+
+    ``source`` is a ``RouteSource`` or a file path; compressed files and
+    archive members are decompressed as they are parsed.
+    """
+    if not isinstance(source, RouteSource):
+        source = RouteSource(source)
+    filename = source.name
+
+    if source.kind == 'gpx':
+        kind, reader = 'GPX', gpx_to_df
+    elif source.kind == 'kml':
+        kind, reader = 'KML', kml_to_df
+    else:
+        return filename, None, None
+
+    try:
+        with source.open() as f:
+            return filename, reader(f, source_file=filename), None
+    except Exception as e:
+        return filename, None, f"Error processing {kind} file {filename}: {e}"
 
 
 class RouteProcessor:
     """Processor for handling GPX/KML route files and merging them into a single DataFrame"""
-    
-    def __init__(self, input_dir, output_dir):
+
+    def __init__(self, input_dir, output_dir, workers=1):
         self.input_dir = input_dir
         self.output_dir = output_dir
-    
-    def merge_files(self):
-        """Merge all GPX and KML files from input directory into a single DataFrame"""
-        all_data = []
-        
+        self.workers = workers
+
+    def merge_files(self, workers=None, skip_duplicates=True):
+        """Merge all GPX and KML files from input directory into a single DataFrame
+
+        Files are parsed in a process pool when ``workers`` (default: the
+        value given to the constructor) is greater than 1; None in the
+        constructor means one worker per CPU. Results are always merged in
+        file name order. With ``skip_duplicates`` tracks repeating an
+        earlier track (e.g. the KML export of a GPX route) are dropped.
+
+        Gzipped files (``.gpx.gz``, ``.kml.gz``) and the GPX/KML members of
+        ``.zip``/``.kmz`` archives are read as well, streamed without
+        extracting them (see ``core.sources``).
+        """
         if not os.path.exists(self.input_dir):
             raise FileNotFoundError(f"Input directory does not exist: {self.input_dir}")
-        
+
+        workers = workers or self.workers or os.cpu_count()
+        sources = list_route_sources(self.input_dir)
+
         # Process all files in input directory
-        for filename in os.listdir(self.input_dir):
-            file_path = os.path.join(self.input_dir, filename)
-            
-            if filename.lower().endswith('.gpx'):
-                try:
-                    df = gpx_to_df(file_path)
-                    all_data.append(df)
-                except Exception as e:
-                    print(f"Error processing GPX file {filename}: {e}")
-            
-            elif filename.lower().endswith('.kml'):
-                try:
-                    df = kml_to_df(file_path)
-                    all_data.append(df)
-                except Exception as e:
-                    print(f"Error processing KML file {filename}: {e}")
-        
+        if workers > 1 and len(sources) > 1:
+            with ProcessPoolExecutor(max_workers=min(workers, len(sources))) as executor:
+                results = list(executor.map(_load_route_file, sources,
+                                            chunksize=max(1, len(sources) // (workers * 4))))
+        else:
+            results = list(map(_load_route_file, sources))
+        close_archives()
+
+        all_data = []
+        for filename, df, error in results:
+            if error:
+                print(error)
+            elif df is not None:
+                all_data.append(df)
+
         if not all_data:
             raise ValueError("No valid GPX or KML files found in input directory")
-        
+
         # Combine all DataFrames
         merged_df = pd.concat(all_data, ignore_index=True)
-        
+
+        # Drop repeated tracks, keeping the first copy in file name order
+        if skip_duplicates:
+            merged_df, duplicates = drop_duplicate_tracks(merged_df, ['source_file', 'placemark'])
+            for source_file, placemark, original in duplicates.itertuples(index=False):
+                print(f"Skipped duplicate track {source_file}: {placemark} (same as {original[0]}: {original[1]})")
+
         # Sort by time if available, otherwise by original order
         if 'time' in merged_df.columns and merged_df['time'].notna().any():
             merged_df['time'] = pd.to_datetime(merged_df['time'])
             merged_df = merged_df.sort_values('time')
-        
+
         return merged_df
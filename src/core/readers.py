@@ -0,0 +1,341 @@
+"""Streaming readers for GPX/KML files
+
+Files are fed block by block to an expat parser with a callback target, so
+point data goes straight into typed columns and no element tree is ever
+built, however large the export.
+
+Every target's ``data`` callback is the bound ``append`` of its text
+buffer: a C method, which expat calls directly without running a Python
+frame for each piece of character data.
+"""
+import hashlib
+import xml.etree.ElementTree as ET
+from array import array
+
+import numpy as np
+
+DEFAULT_CHUNK_SIZE = 65536
+READ_BLOCK_SIZE = 1 << 20
+
+
+class _LocalNames(dict):
+    """Cache of namespace-stripped tag names"""
+
+    def __missing__(self, tag):
+        name = self[tag] = tag.rpartition('}')[2]
+        return name
+
+
+def _open_source(source):
+    """Return (file object, should_close) for a path or open binary file"""
+    if hasattr(source, 'read'):
+        return source, False
+    return open(source, 'rb'), True
+
+
+class HashingReader:
+    """Binary file wrapper that hashes bytes as they are read"""
+
+    def __init__(self, f, algorithm='md5'):
+        self._file = f
+        self._hash = hashlib.new(algorithm)
+
+    def read(self, size=-1):
+        block = self._file.read(size)
+        self._hash.update(block)
+        return block
+
+    def hexdigest(self):
+        """Digest of all bytes read so far"""
+        return self._hash.hexdigest()
+
+
+def _feed(source, parser, target):
+    """Feed source to parser in blocks, yielding target output after each block"""
+    f, should_close = _open_source(source)
+    try:
+        while True:
+            block = f.read(READ_BLOCK_SIZE)
+            if not block:
+                break
+            parser.feed(block)
+            yield from target.drain()
+        parser.close()
+        yield from target.drain(final=True)
+    finally:
+        if should_close:
+            f.close()
+
+
+class _GpxTarget:
+    """Parser target collecting <trkpt> data into column buffers"""
+
+    def __init__(self, chunk_size, extensions=False):
+        self.chunk_size = chunk_size
+        self.extensions = extensions
+        self.local = _LocalNames()
+        self.path = []
+        self.text = []
+        self.data = self.text.append
+        self.track = None
+        self.track_count = 0
+        self.point_ele = None
+        self.point_time = None
+        self.point_clock = None
+        self.point_seconds = None
+        self.ready = []
+        self._reset_buffers()
+
+    def _reset_buffers(self):
+        self.lat, self.lon, self.ele, self.times = array('d'), array('d'), array('d'), []
+        self.clocks, self.seconds = [], []
+
+    def _flush(self):
+        if self.lat:
+            columns = {
+                'latitude': np.frombuffer(self.lat, dtype=np.float64),
+                'longitude': np.frombuffer(self.lon, dtype=np.float64),
+                'altitude': np.frombuffer(self.ele, dtype=np.float64),
+                'time': self.times,
+            }
+            if self.extensions:
+                columns['clock'] = self.clocks
+                columns['seconds'] = self.seconds
+            self.ready.append((self.track, columns))
+            self._reset_buffers()
+
+    def drain(self, final=False):
+        if final:
+            self._flush()
+        ready, self.ready = self.ready, []
+        return ready
+
+    def start(self, tag, attrib):
+        name = self.local[tag]
+        self.path.append(name)
+        self.text.clear()
+        if name == 'trkpt':
+            self.lat.append(float(attrib['lat']))
+            self.lon.append(float(attrib['lon']))
+            self.point_ele = self.point_time = None
+            self.point_clock = self.point_seconds = None
+        elif name == 'trk':
+            self.track = {'index': self.track_count, 'name': None, 'description': None}
+            self.track_count += 1
+
+    def end(self, tag):
+        name = self.path.pop()
+        parent = self.path[-1] if self.path else None
+
+        if parent == 'trkpt':
+            if name == 'ele':
+                self.point_ele = ''.join(self.text).strip()
+            elif name == 'time':
+                self.point_time = ''.join(self.text).strip()
+        elif parent == 'TrackPointExtension' and self.extensions:
+            if name == 'clock':
+                self.point_clock = ''.join(self.text).strip()
+            elif name == 'seconds':
+                self.point_seconds = ''.join(self.text).strip()
+        elif name == 'trkpt':
+            self.ele.append(float(self.point_ele) if self.point_ele else np.nan)
+            self.times.append(self.point_time or None)
+            if self.extensions:
+                self.clocks.append(self.point_clock or None)
+                self.seconds.append(self.point_seconds or None)
+            if len(self.lat) >= self.chunk_size:
+                self._flush()
+        elif parent == 'trk' and self.track is not None:
+            if name == 'name':
+                self.track['name'] = ''.join(self.text)
+            elif name == 'desc':
+                self.track['description'] = ''.join(self.text)
+        elif name == 'trk':
+            self._flush()
+            self.track = None
+        self.text.clear()
+
+    def close(self):
+        pass
+
+
+def iter_gpx_chunks(source, chunk_size=DEFAULT_CHUNK_SIZE, extensions=False):
+    """Stream GPX track points as columnar chunks
+
+    ``source`` is a path or a binary file object. Yields ``(track, columns)``
+    pairs: ``track`` is a dict with the ``index``, ``name`` and
+    ``description`` of the current <trk> and is shared by all chunks of that
+    track; ``columns`` holds float64 arrays ``latitude``, ``longitude`` and
+    ``altitude`` (NaN when missing) and a ``time`` list of raw ISO strings
+    (None when missing). With ``extensions`` the columns also carry ``clock``
+    and ``seconds`` lists read from Garmin <TrackPointExtension> elements in
+    the same pass. At most ``chunk_size`` points are buffered at once.
+    """
+    target = _GpxTarget(chunk_size, extensions)
+    parser = ET.XMLParser(target=target)
+    yield from _feed(source, parser, target)
+
+
+def parse_coordinates(text):
+    """Parse a KML <coordinates> blob into longitude/latitude/altitude arrays
+
+    The whole blob is converted in one ``np.fromstring`` call; tuples
+    without altitude get NaN. Blobs mixing 2D and 3D tuples fall back to
+    per-tuple parsing.
+    """
+    values = np.fromstring(text.replace(',', ' '), dtype=np.float64, sep=' ')
+    count = values.size - text.count(',')
+    if count > 0 and values.size == 3 * count:
+        values = values.reshape(count, 3)
+        return values[:, 0].copy(), values[:, 1].copy(), values[:, 2].copy()
+    if count > 0 and values.size == 2 * count:
+        values = values.reshape(count, 2)
+        return values[:, 0].copy(), values[:, 1].copy(), np.full(count, np.nan)
+
+    rows = [(tuple(map(float, item.split(','))) + (np.nan,))[:3] for item in text.split()]
+    values = np.array(rows, dtype=np.float64).reshape(-1, 3)
+    return values[:, 0].copy(), values[:, 1].copy(), values[:, 2].copy()
+
+
+class _KmlTarget:
+    """Parser target collecting LineString coordinates per Placemark"""
+
+    def __init__(self):
+        self.local = _LocalNames()
+        self.path = []
+        self.text = []
+        self.data = self.text.append
+        self.placemark = None
+        self.ready = []
+
+    def drain(self, final=False):
+        ready, self.ready = self.ready, []
+        return ready
+
+    def start(self, tag, attrib):
+        name = self.local[tag]
+        self.path.append(name)
+        self.text.clear()
+        if name == 'Placemark':
+            self.placemark = {'name': None, 'coordinates': []}
+
+    def end(self, tag):
+        name = self.path.pop()
+        parent = self.path[-1] if self.path else None
+
+        if self.placemark is not None:
+            if name == 'name' and parent == 'Placemark':
+                self.placemark['name'] = ''.join(self.text)
+            elif name == 'coordinates' and parent == 'LineString':
+                self.placemark['coordinates'].append(parse_coordinates(''.join(self.text)))
+            elif name == 'Placemark':
+                for longitude, latitude, altitude in self.placemark['coordinates']:
+                    if len(longitude):
+                        self.ready.append((self.placemark['name'], {
+                            'longitude': longitude,
+                            'latitude': latitude,
+                            'altitude': altitude,
+                        }))
+                self.placemark = None
+        self.text.clear()
+
+    def close(self):
+        pass
+
+
+def iter_kml_linestrings(source):
+    """Stream LineString coordinates from KML Placemarks
+
+    ``source`` is a path or a binary file object. Yields ``(name, columns)``
+    for every non-empty LineString inside a Placemark (including those in
+    Folders and MultiGeometry), where ``columns`` holds float64 arrays
+    ``longitude``, ``latitude`` and ``altitude`` (NaN when missing).
+    """
+    target = _KmlTarget()
+    parser = ET.XMLParser(target=target)
+    yield from _feed(source, parser, target)
+
+
+class _KmlChunkTarget:
+    """Parser target emitting LineString coordinates as they are read
+
+    Coordinate text is parsed after every block fed to the parser, up to
+    the last complete tuple, so one LineString never has to fit in memory.
+    """
+
+    def __init__(self):
+        self.local = _LocalNames()
+        self.path = []
+        self.text = []
+        self.data = self.text.append
+        self.placemark = None
+        self.placemark_count = 0
+        self.line = None
+        self.line_count = 0
+        self.ready = []
+
+    def _emit(self, text):
+        longitude, latitude, altitude = parse_coordinates(text)
+        if len(longitude):
+            self.ready.append((self.line, {
+                'longitude': longitude,
+                'latitude': latitude,
+                'altitude': altitude,
+            }))
+
+    def drain(self, final=False):
+        if self.line is not None and self.text:
+            text = ''.join(self.text)
+            # Keep the possibly incomplete last tuple for the next block
+            cut = max(text.rfind(' '), text.rfind('\n'), text.rfind('\t'), text.rfind('\r'))
+            self.text.clear()
+            if cut > 0:
+                self._emit(text[:cut])
+            self.text.append(text[cut + 1:] if cut >= 0 else text)
+        ready, self.ready = self.ready, []
+        return ready
+
+    def start(self, tag, attrib):
+        name = self.local[tag]
+        parent = self.path[-1] if self.path else None
+        self.path.append(name)
+        self.text.clear()
+        if name == 'Placemark':
+            self.placemark = {'index': self.placemark_count, 'name': None}
+            self.placemark_count += 1
+        elif name == 'coordinates' and parent == 'LineString' and self.placemark is not None:
+            self.line = {'index': self.line_count, 'placemark': self.placemark['index'],
+                         'name': self.placemark['name']}
+            self.line_count += 1
+
+    def end(self, tag):
+        name = self.path.pop()
+        parent = self.path[-1] if self.path else None
+
+        if self.line is not None and name == 'coordinates':
+            self._emit(''.join(self.text))
+            self.line = None
+        elif self.placemark is not None:
+            if name == 'name' and parent == 'Placemark':
+                self.placemark['name'] = ''.join(self.text)
+            elif name == 'Placemark':
+                self.placemark = None
+        self.text.clear()
+
+    def close(self):
+        pass
+
+
+def iter_kml_chunks(source):
+    """Stream LineString coordinates from KML Placemarks in bounded pieces
+
+    Like ``iter_kml_linestrings`` but a long LineString arrives in several
+    pieces of at most one read block each. Yields ``(line, columns)``:
+    ``line`` is a dict with the LineString ``index``, the ``placemark``
+    index and its ``name`` and is shared by all pieces of that LineString.
+    The placemark name must precede its geometry, as the KML schema
+    requires.
+    """
+    target = _KmlChunkTarget()
+    parser = ET.XMLParser(target=target)
+    yield from _feed(source, parser, target)
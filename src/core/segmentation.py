@@ -0,0 +1,185 @@
+"""Transport-mode segmentation of tracks
+
+Each point is classified as stationary, walking or vehicle from a
+centered rolling speed over its track, short runs are absorbed into their
+neighbours, and every remaining mode change is moved to the change point
+of the raw step speeds near it (the rolling window blurs a transition
+over several points). The runs then become segments. Every step is a
+fixed number of passes over the arrays, so the cost is O(n) for the whole
+dataset regardless of how many tracks it holds.
+"""
+import numpy as np
+import pandas as pd
+
+from .geodesy import track_starts
+
+MODES = ('stationary', 'walking', 'vehicle')
+UNKNOWN = -1
+
+
+def _track_bounds(starts):
+    """Index of the first and last point of each point's track"""
+    n = len(starts)
+    track = np.cumsum(starts) - 1
+    first = np.flatnonzero(starts)
+    last = np.append(first[1:], n) - 1
+    return first[track], last[track]
+
+
+def rolling_speeds(distance_m, duration_s, groups=None, window=5, max_speed_kmh=150.0):
+    """Centered rolling speed in km/h over up to ``2 * window + 1`` segments
+
+    Windows never cross a track boundary. Segments without a usable time
+    step, or faster than ``max_speed_kmh`` (GPS jumps), are left out.
+    """
+    distance_m = np.asarray(distance_m, dtype=np.float64)
+    duration_s = np.asarray(duration_s, dtype=np.float64)
+    n = len(distance_m)
+    first, last = _track_bounds(track_starts(groups, n))
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        valid = (duration_s > 0) & (distance_m >= 0) & (distance_m / duration_s * 3.6 <= max_speed_kmh)
+    distance_sum = np.concatenate([[0.0], np.cumsum(np.where(valid, distance_m, 0.0))])
+    duration_sum = np.concatenate([[0.0], np.cumsum(np.where(valid, duration_s, 0.0))])
+
+    index = np.arange(n)
+    lo = np.maximum(index - window, first)
+    hi = np.minimum(index + window, last) + 1
+    distance = distance_sum[hi] - distance_sum[lo]
+    duration = duration_sum[hi] - duration_sum[lo]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(duration > 0, distance / duration * 3.6, np.nan)
+
+
+def mode_labels(modes):
+    """Categorical of mode names for an array of mode codes"""
+    labels = np.array(MODES + ('unknown',), dtype=object)
+    return pd.Categorical(labels[np.asarray(modes)], categories=labels)
+
+
+def _runs(modes, starts):
+    """Run number of every point; a run is a stretch of one mode within a track"""
+    change = starts.copy()
+    change[1:] |= modes[1:] != modes[:-1]
+    return np.cumsum(change) - 1, change
+
+
+def _segment_cost(prefix, start, end):
+    """Weighted squared error of step speeds around their mean, for positions ``start:end``"""
+    weight, moment1, moment2 = (p[end] - p[start] for p in prefix)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(weight > 0, moment2 - moment1 * moment1 / weight, 0.0)
+
+
+def refine_boundaries(modes, distance_m, duration_s, groups=None, window=5, max_speed_kmh=150.0):
+    """Move each mode change to the change point of the step speeds around it
+
+    For every change between two known modes within a track, the split
+    within ``window`` points that best divides the step speeds of the two
+    runs into two constant-speed parts is taken: least squares weighted by
+    duration, which is where the CUSUM statistic of a shift in mean peaks.
+    A change moves at most halfway into either run, so changes keep their
+    order and every run keeps a point. The cost is O(n + changes * window).
+    """
+    modes = np.asarray(modes)
+    distance_m = np.asarray(distance_m, dtype=np.float64)
+    duration_s = np.asarray(duration_s, dtype=np.float64)
+    starts = track_starts(groups, len(modes))
+    run, run_start = _runs(modes, starts)
+    first = np.flatnonzero(run_start)
+    end = np.append(first[1:], len(modes))
+    change = np.flatnonzero(run_start & ~starts)
+    change = change[(modes[change - 1] != UNKNOWN) & (modes[change] != UNKNOWN)]
+    if not len(change):
+        return modes
+
+    # Prefix sums of duration, duration * speed and duration * speed^2 over usable steps
+    with np.errstate(divide='ignore', invalid='ignore'):
+        speed = distance_m / duration_s * 3.6
+        valid = (duration_s > 0) & (distance_m >= 0) & (speed <= max_speed_kmh)
+    weight = np.where(valid, duration_s, 0.0)
+    speed = np.where(valid, speed, 0.0)
+    prefix = [np.concatenate([[0.0], np.cumsum(values)]) for values in (weight, weight * speed,
+                                                                      weight * speed * speed)]
+
+    left = first[run[change] - 1]
+    right = end[run[change]]
+    candidates = change[:, None] + np.arange(-window, window + 1)
+    allowed = ((candidates > (left + change)[:, None] // 2)
+               & (candidates <= (change + right)[:, None] // 2))
+    candidates = np.where(allowed, candidates, change[:, None])
+    cost = (_segment_cost(prefix, left[:, None], candidates)
+            + _segment_cost(prefix, candidates, right[:, None]))
+    best = candidates[np.arange(len(change)), np.argmin(cost, axis=1)]
+    kept = cost.min(axis=1) >= _segment_cost(prefix, left, change) + _segment_cost(prefix, change, right)
+    moved = np.where(kept, change, best)
+
+    new_start = run_start.copy()
+    new_start[change] = False
+    new_start[moved] = True
+    return modes[first][np.cumsum(new_start) - 1]
+
+
+def classify_modes(distance_m, duration_s, groups=None, window=5, stationary_kmh=1.0,
+                   walking_kmh=7.0, max_speed_kmh=150.0, min_segment_s=60.0):
+    """Mode code of every point: index into ``MODES``, or ``UNKNOWN`` without time
+
+    ``distance_m`` and ``duration_s`` are the steps from the previous point
+    (see ``geodesy.segment_distances``/``segment_diff``). Runs shorter than
+    ``min_segment_s`` take the mode of the preceding run in the same track
+    (or the following one at a track start), so a brief stop at a junction
+    does not split a walk. Each remaining mode change is then placed at
+    the change point of the step speeds (see ``refine_boundaries``).
+    """
+    duration_s = np.asarray(duration_s, dtype=np.float64)
+    speed = rolling_speeds(distance_m, duration_s, groups, window, max_speed_kmh)
+    modes = np.searchsorted([stationary_kmh, walking_kmh], speed, side='right')
+    modes[np.isnan(speed)] = UNKNOWN
+
+    starts = track_starts(groups, len(modes))
+    run, run_start = _runs(modes, starts)
+    run_duration = np.bincount(run, weights=np.where(duration_s > 0, duration_s, 0.0))
+    original = pd.Series(modes[run_start], dtype='float64')
+    run_track = np.cumsum(starts)[run_start]
+    short = (run_duration < min_segment_s) & (original != UNKNOWN).to_numpy()
+    run_mode = original.mask(short)
+    run_mode = run_mode.groupby(run_track).ffill().groupby(run_track).bfill()
+    # Tracks made only of short runs keep their raw modes
+    modes = run_mode.fillna(original).to_numpy(dtype=np.int64)[run]
+    return refine_boundaries(modes, distance_m, duration_s, groups, window, max_speed_kmh)
+
+
+def mode_segments(modes, distance_m, duration_s, groups=None):
+    """One row per run of a single mode within a track
+
+    Columns: ``track`` (number of the track in point order), ``segment``
+    (number within the track), ``mode``, ``start``/``end`` (positions of
+    the first and last point), ``points``, ``distance_m``, ``duration_s``
+    and ``avg_speed_kmh``. Distance and duration cover the steps between
+    the segment's points and the step into it from the previous segment.
+    """
+    modes = np.asarray(modes)
+    starts = track_starts(groups, len(modes))
+    run, run_start = _runs(modes, starts)
+    first = np.flatnonzero(run_start)
+    last = np.append(first[1:], len(modes)) - 1
+    track = np.cumsum(starts)[first] - 1
+    track_first = np.flatnonzero(np.r_[True, track[1:] != track[:-1]])
+    segment = np.arange(len(first)) - np.repeat(track_first, np.diff(np.r_[track_first, len(first)]))
+
+    distance = np.bincount(run, weights=np.nan_to_num(np.asarray(distance_m, dtype=np.float64)))
+    duration = np.bincount(run, weights=np.nan_to_num(np.asarray(duration_s, dtype=np.float64)))
+
+    segments = pd.DataFrame({
+        'track': track,
+        'segment': segment,
+        'mode': mode_labels(modes[first]),
+        'start': first,
+        'end': last,
+        'points': last - first + 1,
+        'distance_m': distance,
+        'duration_s': duration,
+    })
+    with np.errstate(divide='ignore', invalid='ignore'):
+        segments['avg_speed_kmh'] = np.where(duration > 0, distance / duration * 3.6, np.nan)
+    return segments
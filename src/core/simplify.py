@@ -0,0 +1,138 @@
+"""Track simplification for exports
+
+Both methods work on points projected to local meters and keep the first
+and last point of every track. They are iterative and array based: an
+explicit stack of ranges for Douglas-Peucker, rounds of vectorized
+removals for Visvalingam-Whyatt. Several tracks are simplified in one
+call by passing a per-point track key.
+"""
+import numpy as np
+
+from .geodesy import EARTH_RADIUS_M, track_starts
+
+METHODS = ('douglas-peucker', 'visvalingam')
+
+
+def project_local(latitude, longitude, groups=None):
+    """Equirectangular x/y in meters, scaled by each track's first latitude"""
+    latitude = np.asarray(latitude, dtype=np.float64)
+    longitude = np.asarray(longitude, dtype=np.float64)
+    starts = track_starts(groups, len(latitude))
+    reference = latitude[np.flatnonzero(starts)][np.cumsum(starts) - 1]
+    x = EARTH_RADIUS_M * np.radians(longitude) * np.cos(np.radians(reference))
+    y = EARTH_RADIUS_M * np.radians(latitude)
+    return x, y, starts
+
+
+def _track_ends(starts):
+    first = np.flatnonzero(starts)
+    last = np.append(first[1:], len(starts)) - 1
+    return first, last
+
+
+def douglas_peucker(x, y, tolerance, starts):
+    """Keep mask of Douglas-Peucker over x/y with ``tolerance`` in the same units
+
+    Distances are measured to the chord segment (not the infinite line), so
+    loops whose start and end coincide are simplified correctly.
+    """
+    keep = np.zeros(len(x), dtype=bool)
+    first, last = _track_ends(starts)
+    keep[first] = keep[last] = True
+    stack = [(a, b) for a, b in zip(first.tolist(), last.tolist()) if b - a > 1]
+    tolerance2 = tolerance * tolerance
+
+    while stack:
+        a, b = stack.pop()
+        dx, dy = x[b] - x[a], y[b] - y[a]
+        px, py = x[a + 1:b] - x[a], y[a + 1:b] - y[a]
+        norm2 = dx * dx + dy * dy
+        t = np.clip((px * dx + py * dy) / norm2, 0.0, 1.0) if norm2 > 0 else 0.0
+        distance2 = (px - t * dx) ** 2 + (py - t * dy) ** 2
+        i = int(np.argmax(distance2))
+        if distance2[i] > tolerance2:
+            m = a + 1 + i
+            keep[m] = True
+            if m - a > 1:
+                stack.append((a, m))
+            if b - m > 1:
+                stack.append((m, b))
+    return keep
+
+
+def visvalingam(x, y, tolerance, starts):
+    """Keep mask of Visvalingam-Whyatt with an effective-area threshold of ``tolerance**2``
+
+    Each round removes, in one vectorized step, every point whose effective
+    area is below the threshold and smaller than both surviving neighbours';
+    neighbours of removed points inherit the removed area as a floor.
+    """
+    n = len(x)
+    alive = np.ones(n, dtype=bool)
+    floor = np.zeros(n)
+    ends = np.zeros(n, dtype=bool)
+    first, last = _track_ends(starts)
+    ends[first] = ends[last] = True
+    threshold = tolerance * tolerance
+
+    while True:
+        index = np.flatnonzero(alive)
+        inner = ~ends[index]
+        inner[[0, -1]] = False
+        middle = np.flatnonzero(inner)
+        if not len(middle):
+            break
+        a, b, c = index[middle - 1], index[middle], index[middle + 1]
+        area = 0.5 * np.abs((x[a] - x[c]) * (y[b] - y[a]) - (x[a] - x[b]) * (y[c] - y[a]))
+        area = np.maximum(area, floor[b])
+
+        full = np.full(len(index), np.inf)
+        full[middle] = area
+        left, right = np.roll(full, 1), np.roll(full, -1)
+        remove = (full < threshold) & (full < left) & (full <= right)
+        if not remove.any():
+            break
+
+        removed = index[remove]
+        alive[removed] = False
+        np.maximum.at(floor, index[np.roll(remove, -1)], full[remove])
+        np.maximum.at(floor, index[np.roll(remove, 1)], full[remove])
+    return alive
+
+
+def simplify_mask(latitude, longitude, tolerance_m, groups=None, method='douglas-peucker'):
+    """Boolean mask of the points kept by simplification
+
+    Points of a track must be contiguous; ``groups`` is the per-point track
+    key (None for a single track).
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown simplification method: {method} (use one of {', '.join(METHODS)})")
+    if len(latitude) == 0:
+        return np.zeros(0, dtype=bool)
+    x, y, starts = project_local(latitude, longitude, groups)
+    if method == 'visvalingam':
+        return visvalingam(x, y, tolerance_m, starts)
+    return douglas_peucker(x, y, tolerance_m, starts)
+
+
+def simplify_df(df, tolerance_m, group_columns=None, method='douglas-peucker'):
+    """Rows of ``df`` kept by simplification, grouped by ``group_columns``
+
+    Tracks do not have to be contiguous; row order within the result
+    follows ``df``.
+    """
+    if group_columns:
+        codes = df.groupby(list(group_columns), sort=False, dropna=False).ngroup().to_numpy()
+    else:
+        codes = np.zeros(len(df), dtype=np.int64)
+    order = np.argsort(codes, kind='stable')
+    keep = np.empty(len(df), dtype=bool)
+    keep[order] = simplify_mask(df['latitude'].to_numpy()[order], df['longitude'].to_numpy()[order],
+                                tolerance_m, codes[order], method)
+    return df[keep]
+
+
+def reduction_ratio(before, after):
+    """How many times fewer points, e.g. 20.0 for 1000 -> 50"""
+    return before / after if after else float('inf')
@@ -0,0 +1,119 @@
+"""Route files on disk, including compressed and archived ones
+
+Inputs are plain ``.gpx``/``.kml`` files, gzipped ``.gpx.gz``/``.kml.gz``
+files, or ``.zip``/``.kmz`` archives holding any number of GPX/KML
+members. Every route file is a ``RouteSource`` whose ``open`` returns a
+binary stream of its decompressed bytes, read straight from the archive,
+so nothing is extracted to disk and the readers see ordinary GPX/KML.
+"""
+import gzip
+import os
+import time
+import zipfile
+
+ROUTE_KINDS = ('gpx', 'kml')
+ARCHIVE_EXTENSIONS = ('.zip', '.kmz')
+
+
+def route_kind(name):
+    """'gpx' or 'kml' for a (possibly gzipped) route file name, else None"""
+    name = name.lower()
+    if name.endswith('.gz'):
+        name = name[:-3]
+    extension = os.path.splitext(name)[1].lstrip('.')
+    return extension if extension in ROUTE_KINDS else None
+
+
+# One open archive per process, shared by all of its members. Sources come
+# in name order, so the members of an archive are read one after another and
+# every archive is opened (and its central directory parsed) only once.
+_shared_archive = {'path': None, 'pid': None, 'archive': None}
+
+
+def _open_archive(path):
+    """The shared ZipFile for ``path``, opening it (and closing the previous one) if needed"""
+    # A handle inherited from a parent process would share its file offset
+    if _shared_archive['path'] != path or _shared_archive['pid'] != os.getpid():
+        _set_shared_archive(path, zipfile.ZipFile(path))
+    return _shared_archive['archive']
+
+
+def _set_shared_archive(path, archive):
+    if _shared_archive['archive'] is not None and _shared_archive['pid'] == os.getpid():
+        _shared_archive['archive'].close()
+    _shared_archive.update(path=path, pid=os.getpid(), archive=archive)
+
+
+def close_archives():
+    """Close the archive kept open for reading members"""
+    _set_shared_archive(None, None)
+
+
+class RouteSource:
+    """One GPX/KML file: a plain or gzipped file, or a member of a zip/KMZ archive
+
+    ``name`` identifies it in the master (``source_file``): the file name,
+    or ``<archive name>/<member path>`` for archive members. ``member`` is
+    the member's name or its ``ZipInfo`` from the archive listing.
+    """
+
+    def __init__(self, path, member=None):
+        self.path = str(path)
+        self.info = member if isinstance(member, zipfile.ZipInfo) else None
+        member = member.filename if self.info is not None else member
+        self.member = member
+        self.kind = route_kind(member if member is not None else self.path)
+        base = os.path.basename(self.path)
+        self.name = f'{base}/{member}' if member is not None else base
+
+    def __repr__(self):
+        return f'RouteSource({self.name!r})'
+
+    def open(self):
+        """Binary stream of the decompressed file content"""
+        if self.member is not None:
+            return _open_archive(self.path).open(self.info or self.member)
+        if self.path.lower().endswith('.gz'):
+            return gzip.open(self.path, 'rb')
+        return open(self.path, 'rb')
+
+    def stat(self):
+        """(size, mtime) for change detection
+
+        Archive members report their uncompressed size and their own
+        modification time from the archive listing.
+        """
+        if self.member is not None:
+            info = self.info or _open_archive(self.path).getinfo(self.member)
+            return info.file_size, time.mktime(info.date_time + (0, 0, -1))
+        stat = os.stat(self.path)
+        return stat.st_size, stat.st_mtime
+
+
+def _archive_members(path):
+    """Route file members (``ZipInfo``) of a zip/KMZ archive, skipping macOS metadata
+
+    The archive stays open as the shared handle its members are read from.
+    """
+    archive = _open_archive(path)
+    return [info for info in archive.infolist()
+            if not info.is_dir() and route_kind(info.filename)
+            and not info.filename.startswith('__MACOSX/')
+            and not os.path.basename(info.filename).startswith('._')]
+
+
+def list_route_sources(input_dir, kinds=ROUTE_KINDS):
+    """Route files of ``input_dir`` of the given kinds, archive members included, in name order"""
+    sources = []
+    for filename in os.listdir(input_dir):
+        path = os.path.join(input_dir, filename)
+        if not os.path.isfile(path):
+            continue
+        if filename.lower().endswith(ARCHIVE_EXTENSIONS):
+            try:
+                sources.extend(RouteSource(path, member) for member in _archive_members(path))
+            except (zipfile.BadZipFile, OSError) as e:
+                print(f"Skipping unreadable archive {filename}: {e}")
+        elif route_kind(filename):
+            sources.append(RouteSource(path))
+    return sorted((source for source in sources if source.kind in kinds), key=lambda source: source.name)
@@ -0,0 +1,202 @@
+"""Persistent grid index over master points
+
+Points are bucketed into square cells of ``cell_size_m`` on an
+equirectangular projection and stored cell by cell as ``.npy`` arrays in a
+``<master>_index`` directory next to the master. Arrays are opened
+memory-mapped, so a query only touches the cell table and the pages of
+the cells it hits; the master itself is never loaded.
+
+Query results carry the master row number of every point, so full rows
+can be fetched afterwards if needed.
+"""
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from .dataset import read_master
+from .geodesy import EARTH_RADIUS_M, haversine
+
+INDEX_VERSION = 1
+DEFAULT_CELL_SIZE_M = 250.0
+_ARRAYS = ('latitude', 'longitude', 'rows', 'track', 'cells', 'offsets')
+
+
+def _grid_cells(latitude, longitude, scale, cell_size):
+    """Integer cell coordinates on the equirectangular grid"""
+    x = EARTH_RADIUS_M * np.radians(longitude) * scale
+    y = EARTH_RADIUS_M * np.radians(latitude)
+    return np.floor(x / cell_size).astype(np.int64), np.floor(y / cell_size).astype(np.int64)
+
+
+def index_path_for(master_path):
+    """Index directory of a master file (shared by its CSV and dataset forms)"""
+    return os.path.splitext(master_path)[0] + '_index'
+
+
+class SpatialIndex:
+    """Grid index with bbox, radius and k-nearest queries"""
+
+    def __init__(self, arrays, meta):
+        self.latitude = arrays['latitude']
+        self.longitude = arrays['longitude']
+        self.rows = arrays['rows']
+        self.track = arrays['track']
+        self.cells = arrays['cells']
+        self.offsets = arrays['offsets']
+        self.meta = meta
+        self.cell_size = meta['cell_size_m']
+        self.scale = np.cos(np.radians(meta['reference_latitude']))
+        self.tracks = pd.DataFrame(meta['tracks'], columns=meta['track_columns'])
+
+    def __len__(self):
+        return len(self.rows)
+
+    @classmethod
+    def build(cls, latitude, longitude, track, tracks, track_columns=('source_file', 'track_name'),
+              cell_size_m=DEFAULT_CELL_SIZE_M):
+        """Index points given by coordinates and per-point track numbers
+
+        ``tracks`` lists the key values of every track number (one row each)
+        and ``track_columns`` names them. Row numbers are point positions.
+        """
+        latitude = np.asarray(latitude, dtype=np.float64)
+        longitude = np.asarray(longitude, dtype=np.float64)
+        reference = float(np.nanmean(latitude)) if len(latitude) else 0.0
+        meta = {
+            'version': INDEX_VERSION,
+            'cell_size_m': float(cell_size_m),
+            'reference_latitude': reference,
+            'track_columns': list(track_columns),
+            'tracks': [list(map(str, key)) for key in tracks],
+        }
+
+        cx, cy = _grid_cells(latitude, longitude, np.cos(np.radians(reference)), meta['cell_size_m'])
+        order = np.lexsort((cy, cx))
+        cx, cy = cx[order], cy[order]
+        new_cell = np.ones(len(order), dtype=bool)
+        new_cell[1:] = (cx[1:] != cx[:-1]) | (cy[1:] != cy[:-1])
+        starts = np.flatnonzero(new_cell)
+
+        arrays = {
+            'latitude': latitude[order],
+            'longitude': longitude[order],
+            'rows': order.astype(np.int64),
+            'track': np.asarray(track, dtype=np.int32)[order],
+            'cells': np.column_stack([cx[starts], cy[starts]]).astype(np.int32),
+            'offsets': np.append(starts, len(order)).astype(np.int64),
+        }
+        return cls(arrays, meta)
+
+    @classmethod
+    def from_master(cls, master_path, track_columns=('source_file', 'track_name'),
+                    cell_size_m=DEFAULT_CELL_SIZE_M):
+        """Index a master file, reading only coordinates and track keys"""
+        track_columns = list(track_columns)
+        points = read_master(master_path, columns=['latitude', 'longitude'] + track_columns)
+        track = points.groupby(track_columns, sort=False, observed=True).ngroup().to_numpy()
+        first = np.unique(track, return_index=True)[1]
+        tracks = points[track_columns].iloc[first].itertuples(index=False, name=None)
+        return cls.build(points['latitude'], points['longitude'], track, tracks, track_columns, cell_size_m)
+
+    def save(self, path):
+        """Write the index as a directory of .npy arrays plus meta.json"""
+        os.makedirs(path, exist_ok=True)
+        for name in _ARRAYS:
+            np.save(os.path.join(path, name + '.npy'), np.asarray(getattr(self, name)))
+        with open(os.path.join(path, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump(self.meta, f, ensure_ascii=False)
+        return path
+
+    @classmethod
+    def load(cls, path, mmap_mode='r'):
+        """Open a saved index with its arrays memory-mapped"""
+        with open(os.path.join(path, 'meta.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get('version') != INDEX_VERSION:
+            raise ValueError(f"Unsupported spatial index version in {path}")
+        arrays = {name: np.load(os.path.join(path, name + '.npy'), mmap_mode=mmap_mode) for name in _ARRAYS}
+        return cls(arrays, meta)
+
+    def _candidates(self, min_lat, min_lon, max_lat, max_lon):
+        """Positions of points in cells overlapping the bbox"""
+        x0, y0 = _grid_cells(min_lat, min_lon, self.scale, self.cell_size)
+        x1, y1 = _grid_cells(max_lat, max_lon, self.scale, self.cell_size)
+        cells = np.asarray(self.cells)
+        hit = np.flatnonzero((cells[:, 0] >= x0) & (cells[:, 0] <= x1) &
+                             (cells[:, 1] >= y0) & (cells[:, 1] <= y1))
+        starts = np.asarray(self.offsets[hit])
+        lengths = np.asarray(self.offsets[hit + 1]) - starts
+        total = int(lengths.sum())
+        if not total:
+            return np.zeros(0, dtype=np.int64)
+        # Concatenated ranges start[i]..start[i]+length[i] without a Python loop
+        steps = np.ones(total, dtype=np.int64)
+        boundaries = np.cumsum(lengths)[:-1]
+        steps[0] = starts[0]
+        steps[boundaries] = starts[1:] - (starts[:-1] + lengths[:-1] - 1)
+        return np.cumsum(steps)
+
+    def _result(self, positions, distance=None):
+        result = pd.DataFrame({
+            'row': np.asarray(self.rows[positions]),
+            'latitude': np.asarray(self.latitude[positions]),
+            'longitude': np.asarray(self.longitude[positions]),
+        })
+        keys = self.tracks.iloc[np.asarray(self.track[positions])].reset_index(drop=True)
+        result = pd.concat([keys, result], axis=1)
+        if distance is not None:
+            result['distance_m'] = distance
+        return result
+
+    def bbox(self, min_lat, min_lon, max_lat, max_lon):
+        """Points inside a latitude/longitude box, ordered by master row"""
+        positions = self._candidates(min_lat, min_lon, max_lat, max_lon)
+        latitude = np.asarray(self.latitude[positions])
+        longitude = np.asarray(self.longitude[positions])
+        inside = ((latitude >= min_lat) & (latitude <= max_lat) &
+                  (longitude >= min_lon) & (longitude <= max_lon))
+        positions = positions[inside]
+        return self._result(positions[np.argsort(np.asarray(self.rows[positions]))])
+
+    def radius(self, latitude, longitude, radius_m):
+        """Points within ``radius_m`` of a location, nearest first"""
+        dlat = np.degrees(radius_m / EARTH_RADIUS_M)
+        dlon = dlat / max(np.cos(np.radians(abs(latitude) + dlat)), 1e-12)
+        positions = self._candidates(latitude - dlat, longitude - dlon, latitude + dlat, longitude + dlon)
+        distance = haversine(latitude, longitude, self.latitude[positions], self.longitude[positions])
+        inside = distance <= radius_m
+        positions, distance = positions[inside], distance[inside]
+        order = np.argsort(distance, kind='stable')
+        return self._result(positions[order], distance[order])
+
+    def nearest(self, latitude, longitude, k=1):
+        """The ``k`` points closest to a location
+
+        The search radius starts at one cell and doubles until it holds
+        ``k`` points, so only nearby cells are read.
+        """
+        k = min(k, len(self))
+        if k <= 0:
+            return self._result(np.zeros(0, dtype=np.int64), np.zeros(0))
+        radius_m = self.cell_size
+        while True:
+            result = self.radius(latitude, longitude, radius_m)
+            if len(result) >= k or radius_m > np.pi * EARTH_RADIUS_M:
+                return result.head(k)
+            radius_m *= 2
+
+    def tracks_in(self, result):
+        """Tracks touched by a query result, with their number of hits"""
+        return result.groupby(list(self.tracks.columns), sort=False).size().rename('points').reset_index()
+
+
+def open_spatial_index(master_path, rebuild=False, cell_size_m=DEFAULT_CELL_SIZE_M):
+    """Load the index of a master, (re)building it if missing or older than the master"""
+    path = index_path_for(master_path)
+    meta_path = os.path.join(path, 'meta.json')
+    if (rebuild or not os.path.exists(meta_path)
+            or os.path.getmtime(meta_path) < os.path.getmtime(master_path)):
+        SpatialIndex.from_master(master_path, cell_size_m=cell_size_m).save(path)
+    return SpatialIndex.load(path)
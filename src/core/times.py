@@ -0,0 +1,87 @@
+"""Typed point times
+
+GPX points carry their time in up to three places: the ISO ``<time>``
+element and the ``clock`` (time of day) and ``seconds`` (elapsed since
+the route start) track point extensions. ``normalize_point_times``
+turns them into a UTC datetime64 ``time`` and an Int64 ``point_seconds``
+with real nulls, in one vectorized pass over all points of a file, and
+fills missing times from the other two where possible.
+
+The clock is the recording device's wall clock, not UTC. It is read in
+``CLOCK_TIMEZONE``: the routes are recorded in Ireland, and track names
+such as ``Belfast 28/10/2024 11:35`` carry Irish local times.
+"""
+import numpy as np
+import pandas as pd
+
+from .geodesy import segment_diff
+
+TIME_DTYPE = 'datetime64[ns, UTC]'
+CLOCK_TIMEZONE = 'Europe/Dublin'
+
+
+def parse_timestamps(values):
+    """UTC datetimes from ISO 8601 text (or datetimes), NaT where unparseable"""
+    values = pd.Series(values)
+    if pd.api.types.is_datetime64_any_dtype(values):
+        parsed = values if values.dt.tz is not None else values.dt.tz_localize('UTC')
+        return parsed.astype(TIME_DTYPE)
+    return pd.to_datetime(values, utc=True, format='ISO8601', errors='coerce').astype(TIME_DTYPE)
+
+
+def parse_seconds(values):
+    """Whole elapsed seconds as Int64, null where missing or not numeric"""
+    return pd.to_numeric(pd.Series(values), errors='coerce').round().astype('Int64')
+
+
+def clock_times(clock, route_date, groups=None, timezone=CLOCK_TIMEZONE):
+    """UTC datetimes from time-of-day clock values and the route date
+
+    ``route_date`` is ``dd/mm/yyyy`` per point and the clock is wall time in
+    ``timezone``; times that do not exist or are ambiguous there (DST
+    changes) are NaT. A clock running backwards by more than 12 hours
+    within a track is taken as passing midnight.
+    """
+    clock = pd.to_timedelta(pd.Series(clock), errors='coerce')
+    groups = np.zeros(len(clock), dtype=np.int64) if groups is None else np.asarray(groups)
+    wrapped = segment_diff(clock.dt.total_seconds().to_numpy(), groups) < -43200
+    days = pd.Series(wrapped.astype(np.int64)).groupby(groups).cumsum().to_numpy()
+    date = pd.to_datetime(pd.Series(route_date, index=clock.index), format='%d/%m/%Y', errors='coerce')
+    local = date + clock + pd.to_timedelta(days, unit='D')
+    return local.dt.tz_localize(timezone, ambiguous='NaT', nonexistent='NaT').dt.tz_convert('UTC').astype(TIME_DTYPE)
+
+
+def normalize_point_times(points, tracks):
+    """Type the time columns of ``points`` in place of their text forms
+
+    ``points`` has ``track_id``, ``time``, ``point_clock`` and
+    ``point_seconds``; ``tracks`` has ``track_id``, ``route_timestamp``
+    and optionally ``route_date``. Returns new frames with ``time`` and
+    ``route_timestamp`` as UTC datetimes and ``point_seconds`` as Int64.
+    Points without a ``time`` get, in order of preference, route date plus
+    clock, or the track start plus elapsed seconds. The track start comes
+    from its first point with both a time and elapsed seconds, else from
+    ``route_timestamp``; without either the times stay NaT. A missing
+    ``route_timestamp`` is then taken from the track's first point time.
+    """
+    tracks = tracks.assign(route_timestamp=parse_timestamps(tracks['route_timestamp']))
+    track_pos = pd.Index(tracks['track_id']).get_indexer(points['track_id'])
+
+    time = parse_timestamps(points['time'])
+    seconds = parse_seconds(points['point_seconds'])
+    clock = points['point_clock'].astype(object).where(points['point_clock'].notna(), None)
+
+    if time.isna().any() and 'route_date' in tracks.columns:
+        route_date = tracks['route_date'].to_numpy(dtype=object)[track_pos]
+        time = time.fillna(clock_times(clock, route_date, track_pos))
+    if time.isna().any():
+        elapsed = pd.to_timedelta(seconds.astype('float64'), unit='s')
+        # Seconds share a base with the track's own times, not with another source's
+        start = (time - elapsed).groupby(track_pos).transform('first')
+        start = start.fillna(tracks['route_timestamp'].iloc[track_pos].set_axis(points.index))
+        time = time.fillna(start + elapsed)
+
+    first_time = time.groupby(track_pos).first().reindex(np.arange(len(tracks)))
+    tracks['route_timestamp'] = tracks['route_timestamp'].fillna(pd.Series(first_time.array, index=tracks.index))
+
+    return points.assign(time=time, point_clock=clock, point_seconds=seconds), tracks
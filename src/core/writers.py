@@ -0,0 +1,196 @@
+"""Streaming writers for GPX/KML files
+
+Writers format whole coordinate columns at once and write them to an open
+file handle in bounded slices, so exports never hold an object tree or the
+full document text in memory.
+"""
+from xml.sax.saxutils import escape
+
+import numpy as np
+
+DEFAULT_CHUNK_SIZE = 65536
+
+_GPX_HEADER = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<gpx xmlns="http://www.topografix.com/GPX/1/1" '
+    'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
+    'xsi:schemaLocation="http://www.topografix.com/GPX/1/1 http://www.topografix.com/GPX/1/1/gpx.xsd" '
+    'version="1.1" creator="kml_processor">\n'
+)
+
+_KML_HEADER = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<kml xmlns="http://www.opengis.net/kml/2.2" xmlns:gx="http://www.google.com/kml/ext/2.2">\n'
+)
+
+
+def escape_text(value):
+    """Escape text for use in XML element content"""
+    return escape(str(value), {'"': '&quot;'})
+
+
+def format_coordinates(longitude, latitude, altitude):
+    """Format coordinate columns as KML ``lon,lat,alt`` tuples
+
+    Floats use their shortest round-trip representation, the same as
+    ``str(float)``. Points with a NaN altitude are written as ``lon,lat``.
+    """
+    altitude = np.asarray(altitude, dtype=np.float64)
+    lon = map(float.__repr__, np.asarray(longitude, dtype=np.float64).tolist())
+    lat = map(float.__repr__, np.asarray(latitude, dtype=np.float64).tolist())
+    if not np.isnan(altitude).any():
+        return ' '.join(map(','.join, zip(lon, lat, map(float.__repr__, altitude.tolist()))))
+    alt = ['' if a != a else ',' + repr(a) for a in altitude.tolist()]
+    return ' '.join(map(''.join, zip(lon, map(','.__add__, lat), alt)))
+
+
+def format_times(times):
+    """Format a datetime64 column as GPX UTC timestamps (None for NaT)
+
+    Fractional seconds are written only for points that have them.
+    """
+    times = np.asarray(times, dtype='datetime64[us]')
+    seconds = np.datetime_as_string(times, unit='s')
+    micros = np.datetime_as_string(times, unit='us')
+    has_fraction = (times.astype(np.int64) % 1_000_000) != 0
+    formatted = np.where(has_fraction, micros, seconds).astype(object) + 'Z'
+    formatted[np.isnat(times)] = None
+    return formatted
+
+
+def format_trkpts(latitude, longitude, elevation, times):
+    """Format point columns as <trkpt> elements
+
+    ``times`` is either a datetime64 column or a sequence of ready
+    timestamps; NaN elevations and missing times are left out.
+    """
+    if getattr(times, 'dtype', None) is not None and times.dtype.kind == 'M':
+        times = format_times(times)
+    lat = map(float.__repr__, np.asarray(latitude, dtype=np.float64).tolist())
+    lon = map(float.__repr__, np.asarray(longitude, dtype=np.float64).tolist())
+    ele = ['' if e != e else f'        <ele>{e!r}</ele>\n'
+           for e in np.asarray(elevation, dtype=np.float64).tolist()]
+    time = ['' if not t else f'        <time>{t}</time>\n' for t in times]
+    return ''.join(map('      <trkpt lat="{}" lon="{}">\n{}{}      </trkpt>\n'.format, lat, lon, ele, time))
+
+
+class GpxWriter:
+    """Incremental writer for GPX 1.1 track documents"""
+
+    def __init__(self, path, chunk_size=DEFAULT_CHUNK_SIZE):
+        self.path = path
+        self.chunk_size = chunk_size
+        self._file = None
+
+    def __enter__(self):
+        self._file = open(self.path, 'w', encoding='utf-8', newline='\n')
+        self._file.write(_GPX_HEADER)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self._file.write('</gpx>\n')
+        finally:
+            self._file.close()
+        return False
+
+    def begin_track(self, name=None):
+        """Open a <trk>, optionally named"""
+        self._file.write('  <trk>\n')
+        if name is not None:
+            self._file.write(f'    <name>{escape_text(name)}</name>\n')
+
+    def end_track(self):
+        """Close the open <trk>"""
+        self._file.write('  </trk>\n')
+
+    def begin_segment(self):
+        """Open a <trkseg> in the current track"""
+        self._file.write('    <trkseg>\n')
+
+    def end_segment(self):
+        """Close the open <trkseg>"""
+        self._file.write('    </trkseg>\n')
+
+    def write_points(self, latitude, longitude, elevation, times):
+        """Append points to the open segment in bounded slices"""
+        for start in range(0, len(latitude), self.chunk_size):
+            stop = start + self.chunk_size
+            self._file.write(format_trkpts(
+                latitude[start:stop], longitude[start:stop], elevation[start:stop], times[start:stop]
+            ))
+
+
+class KmlWriter:
+    """Incremental writer for KML documents of LineString placemarks
+
+    Output layout and element ids match what simplekml produces for a fresh
+    ``Kml()`` with one ``newlinestring`` per placemark.
+    """
+
+    def __init__(self, path, chunk_size=DEFAULT_CHUNK_SIZE):
+        self.path = path
+        self.chunk_size = chunk_size
+        self._file = None
+        self._next_id = 2
+        self._placemarks = 0
+        self._coordinates_written = False
+
+    def __enter__(self):
+        self._file = open(self.path, 'w', encoding='utf-8', newline='\n')
+        self._file.write(_KML_HEADER)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self._write_footer()
+        finally:
+            self._file.close()
+        return False
+
+    def _write_footer(self):
+        if self._placemarks:
+            self._file.write('    </Document>\n</kml>\n')
+        else:
+            self._file.write('    <Document id="1"/>\n</kml>\n')
+
+    def begin_placemark(self, name):
+        """Open a placemark with a LineString geometry"""
+        if not self._placemarks:
+            self._file.write('    <Document id="1">\n')
+        linestring_id, placemark_id = self._next_id, self._next_id + 1
+        self._next_id += 2
+        self._placemarks += 1
+        self._coordinates_written = False
+        self._file.write(
+            f'        <Placemark id="{placemark_id}">\n'
+            f'            <name>{escape_text(name)}</name>\n'
+            f'            <LineString id="{linestring_id}">\n'
+            f'                <coordinates>'
+        )
+
+    def write_coordinates(self, longitude, latitude, altitude):
+        """Append coordinates to the open placemark"""
+        write = self._file.write
+        for start in range(0, len(longitude), self.chunk_size):
+            stop = start + self.chunk_size
+            if self._coordinates_written:
+                write(' ')
+            write(format_coordinates(longitude[start:stop], latitude[start:stop], altitude[start:stop]))
+            self._coordinates_written = True
+
+    def end_placemark(self):
+        """Close the open placemark"""
+        self._file.write(
+            '</coordinates>\n'
+            '            </LineString>\n'
+            '        </Placemark>\n'
+        )
+
+    def write_placemark(self, name, longitude, latitude, altitude):
+        """Write a complete LineString placemark"""
+        self.begin_placemark(name)
+        self.write_coordinates(longitude, latitude, altitude)
+        self.end_placemark()
@@ -3,19 +3,20 @@ import os
 import sys
 from pathlib import Path
 
-# Dodanie ścieżki do core
-sys.path.append(os.path.join(os.path.dirname(__file__), 'core'))
+# Dodanie ścieżki do src, żeby core importował się jako pakiet
+sys.path.append(os.path.dirname(__file__))
 
-from converter import convert_gpx_to_kml, convert_kml_to_gpx
-from analyzer import RouteAnalyzer
+# core modules are imported per action, after argument parsing: --help and
+# a single conversion never pay for importing pandas
 
 
 def main():
     parser = argparse.ArgumentParser(description='KML/GPX Processor - New Architecture')
     parser.add_argument('--action',
-                        choices=['convert', 'analyze', 'master-csv', 'batch'],
+                        choices=['convert', 'analyze', 'master-csv', 'batch', 'segments', 'density'],
                         default='convert',
-                        help='Actions: convert (single), batch (bulk), analyze, master-csv')
+                        help='Actions: convert (single), batch (bulk), analyze, master-csv, '
+                             'segments (transport modes), density (heatmap grids)')
     parser.add_argument('--input',
                         default='data/input',
                         help='Path to input file/folder')
@@ -30,6 +31,29 @@ def main():
                         help='Target format (for conversion)')
     parser.add_argument('--file',
                         help='Specific file to convert (optional)')
+    parser.add_argument('--simplify', type=float, metavar='METERS',
+                        help='convert/batch: simplify tracks to this tolerance in meters')
+    parser.add_argument('--simplify-method', choices=['douglas-peucker', 'visvalingam'],
+                        default='douglas-peucker',
+                        help='convert/batch: simplification algorithm')
+    parser.add_argument('--incremental', action='store_true',
+                        help='master-csv: only parse new or changed files')
+    parser.add_argument('--dataset-format', choices=['parquet', 'feather'],
+                        help='master-csv: also write a typed gps_master.<format> dataset')
+    parser.add_argument('--keep-duplicate-tracks', action='store_true',
+                        help='master-csv: do not skip tracks that repeat an earlier track')
+    parser.add_argument('--workers', type=int,
+                        help='batch: worker processes (default: one per CPU)')
+    parser.add_argument('--max-memory', type=float, metavar='MB',
+                        help='batch: memory (heap) cap per worker process')
+    parser.add_argument('--force', action='store_true',
+                        help='batch: convert files even if the output is up to date')
+    parser.add_argument('--cell-size', type=float, default=50.0, metavar='METERS',
+                        help='density: finest grid cell size (coarser levels are 4x and 20x)')
+    parser.add_argument('--chunk-size', type=int, metavar='ROWS',
+                        help='analyze: compute statistics from the master, streamed in chunks of this '
+                             'many rows (for masters larger than memory), instead of reading them from '
+                             'route_statistics.csv')
 
     args = parser.parse_args()
 
@@ -46,11 +70,13 @@ def main():
         output_path = os.path.join(args.output, output_file)
         
         print(f"Conversion: {args.file} ({args.from_format}) → {output_file} ({args.to_format})")
+        from core.converter import convert_gpx_to_kml, convert_kml_to_gpx
         
         if args.from_format == 'gpx' and args.to_format == 'kml':
-            convert_gpx_to_kml(input_path, output_path)
+            convert_gpx_to_kml(input_path, output_path, args.simplify, args.simplify_method)
         elif args.from_format == 'kml' and args.to_format == 'gpx':
-            convert_kml_to_gpx(input_path, output_path)
+            convert_kml_to_gpx(input_path, output_path, simplify_tolerance=args.simplify,
+                               simplify_method=args.simplify_method)
         else:
             print("Unsupported conversion!")
             return
@@ -66,33 +92,76 @@ def main():
         sys.path.append(os.path.join(os.path.dirname(__file__), 'scripts'))
         from batch_convert import batch_convert
         
-        converted = batch_convert(args.input, args.output, args.from_format, args.to_format)
+        converted = batch_convert(args.input, args.output, args.from_format, args.to_format,
+                                  simplify_tolerance=args.simplify, simplify_method=args.simplify_method,
+                                  workers=args.workers, max_memory_mb=args.max_memory, force=args.force)
         print(f"Converted {len(converted)} files")
 
     elif args.action == 'master-csv':
-        # Run master CSV script
+        # Build master CSV from all GPX files
         sys.path.append(os.path.join(os.path.dirname(__file__), 'scripts'))
-        from gpx_to_master_csv import process_all_files
+        from gpx_fast_converter import create_gpx_master_csv
         
         master_csv = os.path.join(args.output, 'gps_master.csv')
-        df = process_all_files(args.input, master_csv)
+        dataset_path = (os.path.join(args.output, f'gps_master.{args.dataset_format}')
+                        if args.dataset_format else None)
+        result = create_gpx_master_csv(args.input, master_csv, incremental=args.incremental,
+                                       dataset_path=dataset_path,
+                                       skip_duplicates=not args.keep_duplicate_tracks)
         
-        if df is not None:
-            print(f"Created master CSV with {len(df)} points")
+        if result is not None:
+            print(f"Created master CSV with {len(result[0])} points")
 
     elif args.action == 'analyze':
         # Data analysis
-        master_csv = os.path.join(args.output, 'gps_master.csv')
-        if not os.path.exists(master_csv):
+        from core.analyzer import RouteAnalyzer
+        from core.dataset import current_summary_path, default_master_path
+        master_path = default_master_path(args.output)
+        if not os.path.exists(master_path):
             print("First run --action master-csv")
             return
             
-        analyzer = RouteAnalyzer(master_csv)
+        # Route-level totals come from the summary table when it is up to date,
+        # unless streaming from the master was asked for
+        summary_path = None if args.chunk_size else current_summary_path(master_path)
+        print(f"Track statistics from {summary_path or master_path}")
+        analyzer = RouteAnalyzer(master_path, summary=summary_path, chunk_size=args.chunk_size)
         stats = analyzer.get_basic_stats()
         print("=== Analysis Statistics ===")
         for key, value in stats.items():
             print(f"{key}: {value}")
 
+    elif args.action == 'segments':
+        # Transport-mode segmentation of every track
+        from core.analyzer import RouteAnalyzer
+        from core.dataset import default_master_path
+        master_path = default_master_path(args.output)
+        if not os.path.exists(master_path):
+            print("First run --action master-csv")
+            return
+
+        segments = RouteAnalyzer(master_path).get_transport_segments()
+        segments_csv = os.path.join(args.output, 'transport_segments.csv')
+        segments.to_csv(segments_csv, index=False)
+        print(f"Wrote {len(segments)} segments to {segments_csv}")
+        print(segments.groupby('mode', observed=True)['distance_m'].sum().div(1000).round(2).to_string())
+
+    elif args.action == 'density':
+        # Multi-resolution point density grids for heatmaps
+        from core.analyzer import RouteAnalyzer
+        from core.dataset import default_master_path
+        master_path = default_master_path(args.output)
+        if not os.path.exists(master_path):
+            print("First run --action master-csv")
+            return
+
+        grids = RouteAnalyzer(master_path).get_density_grids(cell_size_m=args.cell_size)
+        grids_csv = os.path.join(args.output, 'density_grids.csv')
+        grids.to_csv(grids_csv, index=False, float_format='%.6f')
+        print(f"Wrote {len(grids)} grid cells to {grids_csv}")
+        print(grids.groupby('cell_size_m')['points'].agg(['size', 'max']).rename(
+            columns={'size': 'cells', 'max': 'max_points'}).to_string())
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+batch_convert.py
+Bulk GPX <-> KML conversion of a whole folder in parallel
+"""
+
+import os
+import sys
+import time
+import argparse
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from core.converter import convert_gpx_to_kml, convert_kml_to_gpx
+
+CONVERTERS = {
+    ('gpx', 'kml'): convert_gpx_to_kml,
+    ('kml', 'gpx'): convert_kml_to_gpx,
+}
+
+def limit_memory(max_memory_mb):
+    """Cap the data segment (heap) of the current (worker) process
+
+    The cap covers the whole process, interpreter and libraries included.
+    A file that does not fit fails with MemoryError instead of pushing the
+    machine into swap. RLIMIT_DATA is used rather than RLIMIT_AS because
+    some libraries reserve large unused address ranges at import. Not
+    available on Windows.
+    """
+    try:
+        import resource
+    except ImportError:
+        print('Memory cap not supported on this platform')
+        return
+    limit = int(max_memory_mb * 1024 * 1024)
+    resource.setrlimit(resource.RLIMIT_DATA, (limit, limit))
+
+def is_up_to_date(input_path, output_path):
+    """Whether the output exists and is not older than the input"""
+    return os.path.exists(output_path) and os.path.getmtime(output_path) >= os.path.getmtime(input_path)
+
+def convert_file(task):
+    """Convert one file; returns (input, output, points, error)"""
+    input_path, output_path, convert, simplify_tolerance, simplify_method = task
+    # Written under a temporary name, so a failure never leaves a truncated output
+    partial_path = output_path + '.part'
+    try:
+        points = convert(input_path, partial_path, simplify_tolerance=simplify_tolerance,
+                         simplify_method=simplify_method)
+        os.replace(partial_path, output_path)
+        return input_path, output_path, points, None
+    except Exception as e:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        error = 'memory limit exceeded' if isinstance(e, MemoryError) else str(e)
+        return input_path, output_path, 0, error
+
+def convert_isolated(task, initializer=None, initargs=()):
+    """Convert one file in a worker process of its own, reporting a crash as its failure"""
+    input_path, output_path = task[:2]
+    try:
+        with ProcessPoolExecutor(max_workers=1, initializer=initializer, initargs=initargs) as executor:
+            return executor.submit(convert_file, task).result()
+    except (BrokenProcessPool, MemoryError) as e:
+        partial_path = output_path + '.part'
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        error = 'memory limit exceeded' if isinstance(e, MemoryError) else f'worker process died ({e})'
+        return input_path, output_path, 0, error
+
+def batch_convert(input_dir, output_dir, from_format, to_format, simplify_tolerance=None,
+                  simplify_method='douglas-peucker', workers=None, max_memory_mb=None, force=False):
+    """Convert every ``*.<from_format>`` file of ``input_dir`` into ``output_dir``
+
+    Files run in a process pool of ``workers`` (default: one per CPU).
+    With ``max_memory_mb`` each worker's memory is capped, so one
+    huge file fails on its own instead of exhausting memory. Outputs newer
+    than their input are skipped unless ``force`` (changing the
+    simplification settings needs ``force``). Returns the output paths
+    written.
+    """
+    convert = CONVERTERS.get((from_format, to_format))
+    if convert is None:
+        raise ValueError(f"Unsupported conversion: {from_format} -> {to_format}")
+
+    print(f'BATCH CONVERT {from_format.upper()} -> {to_format.upper()}')
+    print('=' * 50)
+
+    os.makedirs(output_dir, exist_ok=True)
+    input_files = sorted(Path(input_dir).glob(f'*.{from_format}'))
+    tasks = []
+    skipped = 0
+    for input_file in input_files:
+        output_path = os.path.join(output_dir, input_file.stem + f'.{to_format}')
+        if not force and is_up_to_date(input_file, output_path):
+            skipped += 1
+            continue
+        tasks.append((str(input_file), output_path, convert, simplify_tolerance, simplify_method))
+
+    print(f'Found {len(input_files)} files: {len(tasks)} to convert, {skipped} up to date')
+
+    workers = min(workers or os.cpu_count() or 1, max(len(tasks), 1))
+    start = time.perf_counter()
+    converted = []
+    failed = 0
+    total_points = 0
+
+    def report(result):
+        nonlocal failed, total_points
+        input_path, output_path, points, error = result
+        if error:
+            failed += 1
+            print(f'  ✗ {os.path.basename(input_path)}: {error}')
+        else:
+            converted.append(output_path)
+            total_points += points
+            print(f'  ✓ {os.path.basename(input_path)} ({points} points)')
+
+    if tasks and (workers > 1 or max_memory_mb):
+        initializer, initargs = (limit_memory, (max_memory_mb,)) if max_memory_mb else (None, ())
+        with ProcessPoolExecutor(max_workers=workers, initializer=initializer, initargs=initargs) as executor:
+            # Largest files first, so a big file does not start last and run alone
+            tasks.sort(key=lambda task: os.path.getsize(task[0]), reverse=True)
+            futures = {executor.submit(convert_file, task): task for task in tasks}
+            broken = []
+            for future in as_completed(futures):
+                try:
+                    report(future.result())
+                except (BrokenProcessPool, MemoryError):
+                    broken.append(futures[future])
+        # A worker that dies (e.g. killed over the memory cap) breaks the whole pool and
+        # fails every pending file with it: retry those alone, so only the culprit fails
+        for task in broken:
+            report(convert_isolated(task, initializer, initargs))
+    else:
+        for task in tasks:
+            report(convert_file(task))
+
+    elapsed = time.perf_counter() - start
+    print('\n' + '=' * 50)
+    print(f'Converted: {len(converted)}, skipped: {skipped}, failed: {failed} ({workers} workers)')
+    if converted:
+        print(f'Time: {elapsed:.2f} s, {len(converted) / elapsed:.1f} files/s, '
+              f'{total_points / elapsed:,.0f} points/s')
+    return sorted(converted)
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description='Bulk GPX <-> KML conversion')
+    parser.add_argument('input_dir', help='Folder with files to convert')
+    parser.add_argument('output_dir', help='Folder for converted files')
+    parser.add_argument('--from-format', choices=['gpx', 'kml'], required=True)
+    parser.add_argument('--to-format', choices=['gpx', 'kml'], required=True)
+    parser.add_argument('--simplify', type=float, metavar='METERS',
+                        help='Simplify tracks to this tolerance in meters')
+    parser.add_argument('--simplify-method', choices=['douglas-peucker', 'visvalingam'],
+                        default='douglas-peucker')
+    parser.add_argument('--workers', type=int, help='Worker processes (default: one per CPU)')
+    parser.add_argument('--max-memory', type=float, metavar='MB',
+                        help='Memory (heap) cap per worker process')
+    parser.add_argument('--force', action='store_true', help='Convert files even if the output is up to date')
+    args = parser.parse_args()
+
+    return batch_convert(args.input_dir, args.output_dir, args.from_format, args.to_format,
+                         simplify_tolerance=args.simplify, simplify_method=args.simplify_method,
+                         workers=args.workers, max_memory_mb=args.max_memory, force=args.force)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+benchmark_geodesy.py
+Per-point cost and accuracy of the distance kernels in core.geodesy
+"""
+
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from core.geodesy import KERNELS, segment_distances
+
+def synthetic_track(n, seed=0):
+    """Random walk of n points around Wicklow with ~10 m steps"""
+    rng = np.random.default_rng(seed)
+    heading = np.cumsum(rng.normal(0, 0.3, n))
+    step = rng.uniform(5, 15, n)
+    latitude = 53.0 + np.cumsum(step * np.cos(heading)) / 111320
+    longitude = -6.4 + np.cumsum(step * np.sin(heading)) / (111320 * np.cos(np.radians(53.0)))
+    return latitude, longitude
+
+def best_of(func, repeat):
+    """Best wall time of ``repeat`` calls"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description='Benchmark geodesic distance kernels')
+    parser.add_argument('--points', type=int, default=1_000_000, help='Track length')
+    parser.add_argument('--repeat', type=int, default=5, help='Timed runs per kernel (best is reported)')
+    args = parser.parse_args()
+
+    latitude, longitude = synthetic_track(args.points)
+    reference = segment_distances(latitude, longitude, method='vincenty')
+
+    print(f'{args.points:,} points, best of {args.repeat} runs')
+    print(f'{"kernel":<16}{"ns/point":>10}{"total km":>12}{"max err vs vincenty":>22}')
+    for name in KERNELS:
+        seconds = best_of(lambda: segment_distances(latitude, longitude, method=name), args.repeat)
+        distance = segment_distances(latitude, longitude, method=name)
+        relative = np.nanmax(np.abs(distance - reference) / reference)
+        print(f'{name:<16}{seconds / args.points * 1e9:>10.1f}{np.nansum(distance) / 1000:>12.3f}'
+              f'{relative * 100:>21.3f}%')
+
+    # The approximation this module replaces, for comparison
+    start = time.perf_counter()
+    legacy = np.sqrt(np.diff(latitude) ** 2 + np.diff(longitude) ** 2) * 111000
+    seconds = time.perf_counter() - start
+    relative = np.max(np.abs(legacy - reference[1:]) / reference[1:])
+    print(f'{"deg*111 (old)":<16}{seconds / args.points * 1e9:>10.1f}{legacy.sum() / 1000:>12.3f}'
+          f'{relative * 100:>21.3f}%')
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+benchmark_startup.py
+Startup latency of the CLI and import cost of the core modules
+"""
+
+import os
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+import shutil
+import tempfile
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+MAIN = os.path.join(SRC_DIR, 'main.py')
+SAMPLE_GPX = os.path.join(SRC_DIR, '..', 'data', 'input', 'to Glenmalure.gpx')
+
+# Modules that light code paths must not import
+HEAVY_MODULES = ['pandas', 'pyarrow', 'scipy', 'matplotlib']
+
+# Imports checked for heavy modules: (label, statement, must stay light)
+IMPORTS = [
+    ('core', 'import core', True),
+    ('core.converter', 'import core.converter', True),
+    ('core.readers', 'import core.readers', True),
+    ('core.writers', 'import core.writers', True),
+    ('core.analyzer', 'import core.analyzer', False),
+    ('gpx_fast_converter', 'import scripts.gpx_fast_converter', False),
+]
+
+def median_ms(command, repeat):
+    """Median wall time of ``repeat`` runs of a command, in ms"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(command, cwd=SRC_DIR, check=True, stdout=subprocess.DEVNULL)
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+def loaded_heavy_modules(statement):
+    """Heavy modules present in sys.modules after running ``statement`` in a fresh interpreter"""
+    check = f'import sys; {statement}; print(" ".join(m for m in {HEAVY_MODULES!r} if m in sys.modules))'
+    result = subprocess.run([sys.executable, '-c', check], cwd=SRC_DIR, check=True,
+                            capture_output=True, text=True)
+    return result.stdout.split()
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description='Benchmark CLI startup and core import time')
+    parser.add_argument('--repeat', type=int, default=10, help='Runs per measurement (median is reported)')
+    parser.add_argument('--max-ms', type=float,
+                        help='Fail if a light CLI command (--help, single convert) takes longer than this')
+    args = parser.parse_args()
+
+    output_dir = tempfile.mkdtemp(prefix='startup_benchmark_')
+    baseline = median_ms([sys.executable, '-c', 'pass'], args.repeat)
+    commands = [
+        ('main.py --help', [sys.executable, MAIN, '--help'], True),
+        ('convert (1 file)', [sys.executable, MAIN, '--action', 'convert',
+                              '--input', os.path.dirname(SAMPLE_GPX), '--output', output_dir,
+                              '--file', os.path.basename(SAMPLE_GPX),
+                              '--from-format', 'gpx', '--to-format', 'kml'], True),
+        ('import core.analyzer', [sys.executable, '-c', 'import core.analyzer'], False),
+    ]
+
+    print(f'Median of {args.repeat} runs, interpreter startup {baseline:.0f} ms')
+    print(f'{"command":<24}{"ms":>8}{"over python":>14}')
+    too_slow = []
+    try:
+        for label, command, light in commands:
+            ms = median_ms(command, args.repeat)
+            print(f'{label:<24}{ms:>8.0f}{ms - baseline:>14.0f}')
+            if light and args.max_ms and ms > args.max_ms:
+                too_slow.append(label)
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+    print(f'\n{"import":<24}heavy modules loaded')
+    leaks = []
+    for label, statement, light in IMPORTS:
+        heavy = loaded_heavy_modules(statement)
+        print(f'{label:<24}{", ".join(heavy) or "-"}')
+        if light and heavy:
+            leaks.append(label)
+
+    failures = [f'{label} slower than {args.max_ms:.0f} ms' for label in too_slow]
+    failures += [f'{label} imports heavy modules' for label in leaks]
+    for failure in failures:
+        print(f'✗ {failure}')
+    if failures:
+        sys.exit(1)
+    print('✓ Startup within limits')
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+check_incremental_build.py
+Check that incremental master builds write the same outputs as full rebuilds
+"""
+
+import os
+import sys
+import re
+import gzip
+import shutil
+import argparse
+import tempfile
+import contextlib
+
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from scripts.gpx_fast_converter import create_gpx_master_csv
+
+DEFAULT_INPUT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'data', 'input')
+
+# Outputs compared between builds; processed_timestamp differs by design
+OUTPUTS = ['gps_master.csv', 'route_statistics.csv']
+IGNORED_COLUMNS = ['processed_timestamp']
+DUPLICATE_NAME = '00 copy.gpx.gz'
+PARTIAL_NAME = '00 part.gpx'
+
+def add_duplicate(input_dir, gpx_name):
+    """Gzipped copy of a file that sorts before every other file"""
+    with open(os.path.join(input_dir, gpx_name), 'rb') as src, \
+            gzip.open(os.path.join(input_dir, DUPLICATE_NAME), 'wb') as dst:
+        shutil.copyfileobj(src, dst)
+
+def add_partial_copy(input_dir, gpx_name):
+    """Copy of the first half of a file's points, sorting first: its later points lose rows to it"""
+    with open(os.path.join(input_dir, gpx_name), encoding='utf-8') as f:
+        gpx = f.read()
+    points = re.findall(r'<trkpt\b.*?</trkpt>', gpx, flags=re.DOTALL)
+    start = gpx.index(points[0])
+    end = gpx.index(points[-1]) + len(points[-1])
+    with open(os.path.join(input_dir, PARTIAL_NAME), 'w', encoding='utf-8') as f:
+        f.write(gpx[:start] + ''.join(points[:len(points) // 2]) + gpx[end:])
+
+def touch(input_dir, gpx_name):
+    """New mtime, same content"""
+    path = os.path.join(input_dir, gpx_name)
+    mtime = os.path.getmtime(path) + 60
+    os.utime(path, (mtime, mtime))
+
+def remove(input_dir, gpx_name):
+    os.remove(os.path.join(input_dir, gpx_name))
+
+def build(input_dir, output_dir, incremental):
+    """Master build with its console output suppressed"""
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        create_gpx_master_csv(input_dir, os.path.join(output_dir, 'gps_master.csv'), incremental=incremental)
+
+def differences(output_a, output_b):
+    """Outputs whose content differs between two output directories"""
+    different = []
+    for name in OUTPUTS:
+        a, b = (pd.read_csv(os.path.join(directory, name), dtype=str, keep_default_na=False)
+                .drop(columns=IGNORED_COLUMNS, errors='ignore') for directory in (output_a, output_b))
+        if not a.equals(b):
+            different.append(name)
+    return different
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description='Compare incremental master builds with full rebuilds')
+    parser.add_argument('--input', default=DEFAULT_INPUT, help='Directory of GPX files to build from')
+    args = parser.parse_args()
+
+    gpx_names = sorted(name for name in os.listdir(args.input) if name.lower().endswith('.gpx'))
+    if len(gpx_names) < 3 or gpx_names[0] < PARTIAL_NAME:
+        sys.exit(f'Need at least 3 GPX files in {args.input}, all sorting after {PARTIAL_NAME!r}')
+
+    # Each step changes the input, then builds incrementally on the previous output
+    steps = [
+        ('initial build', lambda d: None),
+        ('add duplicate that sorts first', lambda d: add_duplicate(d, gpx_names[0])),
+        ('add partial copy that sorts first', lambda d: add_partial_copy(d, gpx_names[1])),
+        ('touch unchanged file', lambda d: touch(d, gpx_names[1])),
+        ('delete partial copy', lambda d: remove(d, PARTIAL_NAME)),
+        ('delete duplicate', lambda d: remove(d, DUPLICATE_NAME)),
+        ('delete file', lambda d: remove(d, gpx_names[2])),
+    ]
+
+    work_dir = tempfile.mkdtemp(prefix='incremental_check_')
+    input_dir = os.path.join(work_dir, 'input')
+    incremental_dir = os.path.join(work_dir, 'incremental')
+    shutil.copytree(args.input, input_dir)
+    os.makedirs(incremental_dir)
+
+    failures = []
+    try:
+        for label, change in steps:
+            change(input_dir)
+            full_dir = tempfile.mkdtemp(dir=work_dir)
+            build(input_dir, incremental_dir, incremental=True)
+            build(input_dir, full_dir, incremental=False)
+            different = differences(incremental_dir, full_dir)
+            print(f'{"✗" if different else "✓"} {label}{": " + ", ".join(different) + " differ" if different else ""}')
+            if different:
+                failures.append(label)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    if failures:
+        sys.exit(1)
+    print('✓ Incremental builds match full rebuilds')
+
+if __name__ == "__main__":
+    main()
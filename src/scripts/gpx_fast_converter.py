@@ -7,13 +7,24 @@ Fast processing, full data, no duplicates
 
 import os
 import sys
+import argparse
+import numpy as np
 import pandas as pd
-import gpxpy
-from pathlib import Path
-import hashlib
 from datetime import datetime
 import re
-import xml.etree.ElementTree as ET
+import json
+import hashlib
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from core.analyzer import RouteAnalyzer
+from core.dataset import summary_path_for, write_master_dataset
+from core.duplicates import TrackMatcher, find_duplicate_tracks
+from core.identity import format_point_ids, point_keys
+from core.readers import HashingReader, iter_gpx_chunks
+from core.sources import RouteSource, close_archives, list_route_sources
+from core.spatial import SpatialIndex, index_path_for
+from core.times import normalize_point_times
 
 def extract_route_stats(description):
     """Fast extraction of stats from description"""
@@ -44,237 +55,485 @@ def extract_route_stats(description):
     
     return stats
 
-def extract_time_from_extensions(point):
-    """Extract time data from GPX extensions"""
-    try:
-        # Get extensions element
-        extensions = point.extensions
-        if not extensions:
-            return None, None
-        
-        # Find TrackPointExtension
-        for elem in extensions.extensions:
-            if hasattr(elem, 'tag') and 'TrackPointExtension' in elem.tag:
-                # Look for clock and seconds
-                clock_time = None
-                seconds = None
-                
-                for child in elem.children:
-                    if hasattr(child, 'tag'):
-                        tag_name = child.tag.split('}')[-1] if '}' in child.tag else child.tag
-                        if tag_name == 'clock' and hasattr(child, 'text'):
-                            clock_time = child.text
-                        elif tag_name == 'seconds' and hasattr(child, 'text'):
-                            seconds = child.text
-                
-                return clock_time, seconds
-        
-        return None, None
-    except:
-        return None, None
+def _route_info(track_name, first_time, route_stats):
+    """Route timestamp from the first point time, route date from it or the track name"""
+    route_timestamp = first_time
 
-def extract_time_from_xml(point_xml):
-    """Extract time from raw XML element"""
-    try:
-        extensions = point_xml.find('.//{http://www.topografix.com/GPX/1/1}extensions')
-        if extensions is not None:
-            track_ext = extensions.find('.//{http://www.garmin.com/xmlschemas/TrackPointExtension/v1}TrackPointExtension')
-            if track_ext is not None:
-                clock_elem = track_ext.find('.//{http://www.garmin.com/xmlschemas/TrackPointExtension/v1}clock')
-                seconds_elem = track_ext.find('.//{http://www.garmin.com/xmlschemas/TrackPointExtension/v1}seconds')
-                
-                clock_time = clock_elem.text if clock_elem is not None else None
-                seconds = seconds_elem.text if seconds_elem is not None else None
-                
-                return clock_time, seconds
-        
-        return None, None
-    except:
-        return None, None
+    # Extract date from first point time if no route_date from description
+    if route_timestamp and 'route_date' not in route_stats:
+        try:
+            dt = datetime.fromisoformat(route_timestamp.replace('Z', '+00:00'))
+            route_stats['route_date'] = dt.strftime('%d/%m/%Y')
+        except ValueError:
+            pass
+
+    # If no time in points, the name gives the date only (no timestamp is made up)
+    if route_timestamp is None and track_name:
+        date_match = re.search(r'(\d{2}/\d{2}/\d{4})', track_name)
+        if date_match:
+            route_stats.setdefault('route_date', date_match.group(1))
+
+    return route_timestamp
+
+# Datetimes in the CSV outputs are written as ISO 8601 UTC
+CSV_DATE_FORMAT = '%Y-%m-%dT%H:%M:%S.%fZ'
+
+# Column order of the flat master CSV; route stats columns follow
+POINT_COLUMNS = ['latitude', 'longitude', 'altitude', 'time', 'point_clock', 'point_seconds']
+MASTER_COLUMNS = ['unique_point_id', 'track_name', 'latitude', 'longitude', 'altitude', 'time',
+                  'route_timestamp', 'source_file', 'file_hash', 'file_type', 'track_description',
+                  'processed_timestamp', 'point_clock', 'point_seconds']
+
+def _track_points(track, columns, track_id):
+    """Build point columns and the track-level record for one track"""
+    latitude = np.concatenate(columns['latitude'])
+    longitude = np.concatenate(columns['longitude'])
+    altitude = np.concatenate(columns['altitude'])  # NaN where missing
+    point_clock = np.array(columns['clock'], dtype=object)
+    point_seconds = np.array(columns['seconds'], dtype=object)
+    point_time = np.array(columns['time'], dtype=object)  # typed in normalize_point_times
+
+    # Stats from description
+    route_stats = extract_route_stats(track['description'])
+    route_timestamp = _route_info(track['name'], columns['time'][0], route_stats)
+
+    points = pd.DataFrame({
+        'track_id': np.full(len(latitude), track_id, dtype=np.int32),
+        'latitude': latitude,
+        'longitude': longitude,
+        'altitude': altitude,
+        'time': point_time,
+        'point_clock': point_clock,  # clock time from extensions
+        'point_seconds': point_seconds,  # seconds from extensions
+    })
+    track_record = {
+        'track_id': track_id,
+        'track_name': track['name'],
+        'route_timestamp': route_timestamp,
+        'track_description': track['description'],
+        **route_stats  # Add route stats
+    }
+    return points, track_record
 
 def process_gpx_fast(gpx_file_path):
-    """Lightning fast GPX processing with enhanced time extraction"""
-    filename = os.path.basename(gpx_file_path)
+    """Lightning fast GPX processing with enhanced time extraction
+
+    The file is read once: it is hashed while being streamed to the parser,
+    and point time, extension clock and seconds come from the same pass.
+    ``gpx_file_path`` is a path or a ``RouteSource``; gzipped files and
+    archive members are decompressed in the same stream and hashed as
+    decompressed GPX. Returns ``(points, tracks)``: point columns keyed by
+    a file-local ``track_id`` and one row of track-level attributes per
+    track, or None on error.
+    """
+    source = gpx_file_path if isinstance(gpx_file_path, RouteSource) else RouteSource(gpx_file_path)
+    filename = source.name
     print(f'GPX: {filename}')
-    
+
     try:
-        # Check if it's a backup file with time extensions
-        is_backup_file = 'full_backup' in filename
-        
-        # Fast loading
-        with open(gpx_file_path, 'r', encoding='utf-8') as f:
-            gpx = gpxpy.parse(f)
-        
-        track_data = []
-        file_hash = hashlib.md5(open(gpx_file_path, 'rb').read()).hexdigest()
-        
-        # For backup files, also parse with ElementTree to get extensions
-        backup_tree = None
-        if is_backup_file:
-            try:
-                backup_tree = ET.parse(gpx_file_path)
-            except:
-                pass
-        
-        for track_idx, track in enumerate(gpx.tracks):
-            # Stats from description
-            route_stats = extract_route_stats(track.description)
-            
-            # Route timestamp (first point OR from name)
-            route_timestamp = None
-            route_date = None
-            
-            if track.segments and track.segments[0].points:
-                first_point = track.segments[0].points[0]
-                route_timestamp = first_point.time.isoformat() if first_point.time else None
-                
-                # Extract date from first point time if no route_date from description
-                if route_timestamp and 'route_date' not in route_stats:
-                    try:
-                        dt = datetime.fromisoformat(route_timestamp.replace('Z', '+00:00'))
-                        route_date = dt.strftime('%d/%m/%Y')
-                    except:
-                        pass
-            
-            # If no time in points, try to extract from name
-            if route_timestamp is None and track.name:
-                # Search for date in track name
-                date_match = re.search(r'(\d{2}/\d{2}/\d{4})', track.name)
-                if date_match:
-                    date_str = date_match.group(1)
-                    # Add sample time
-                    route_timestamp = f"{date_str}T09:00:00+00:00"
-                    route_date = date_str
-            
-            # Add route_date if extracted from time
-            if route_date and 'route_date' not in route_stats:
-                route_stats['route_date'] = route_date
-            
-            # Get backup track points for time extraction
-            backup_track_points = None
-            if backup_tree and is_backup_file:
-                backup_tracks = backup_tree.findall('.//{http://www.topografix.com/GPX/1/1}trk')
-                if track_idx < len(backup_tracks):
-                    backup_track_points = backup_tracks[track_idx].findall('.//{http://www.topografix.com/GPX/1/1}trkpt')
-            
-            for seg_idx, segment in enumerate(track.segments):
-                for point_idx, point in enumerate(segment.points):
-                    # Try to extract time from extensions first
-                    point_time = None
-                    clock_time = None
-                    seconds = None
-                    
-                    if point.time:
-                        point_time = point.time.isoformat()
-                    elif backup_track_points and point_idx < len(backup_track_points):
-                        # Extract from backup XML
-                        clock_time, seconds = extract_time_from_xml(backup_track_points[point_idx])
-                        if clock_time:
-                            point_time = clock_time
-                    
-                    # If still no time, try gpxpy extensions
-                    if not point_time:
-                        clock_time, seconds = extract_time_from_extensions(point)
-                        if clock_time:
-                            point_time = clock_time
-                    
-                    if not point_time:
-                        point_time = 'no_time'
-                    
-                    # Unique ID
-                    point_id = f"{point.latitude:.6f}_{point.longitude:.6f}_{point_time}"
-                    
-                    track_data.append({
-                        'unique_point_id': point_id,
-                        'track_name': track.name or f"Track_{len(track_data)}",
-                        'latitude': point.latitude,
-                        'longitude': point.longitude,
-                        'altitude': point.elevation or 0.0,
-                        'time': point_time,
-                        'route_timestamp': route_timestamp,
-                        'source_file': filename,
-                        'file_hash': file_hash,
-                        'file_type': 'gpx',
-                        'track_description': track.description,
-                        'processed_timestamp': datetime.now().isoformat(),
-                        'point_clock': clock_time,  # NEW - clock time from extensions
-                        'point_seconds': seconds,   # NEW - seconds from extensions
-                        **route_stats  # Add route stats
-                    })
-        
-        return track_data
-        
+        frames = []
+        track_records = []
+        point_count = 0
+        track, columns = None, None
+
+        def finish_track():
+            points, record = _track_points(track, columns, len(track_records))
+            record['track_name'] = record['track_name'] or f"Track_{point_count}"
+            frames.append(points)
+            track_records.append(record)
+            return point_count + len(points)
+
+        with source.open() as f:
+            reader = HashingReader(f)
+            for chunk_track, chunk in iter_gpx_chunks(reader, extensions=True):
+                if chunk_track is not track:
+                    if track is not None:
+                        point_count = finish_track()
+                    track = chunk_track
+                    columns = {key: [] for key in chunk}
+                for key, values in chunk.items():
+                    if isinstance(values, list):
+                        columns[key].extend(values)
+                    else:
+                        columns[key].append(values)
+            if track is not None:
+                finish_track()
+            file_hash = reader.hexdigest()
+
+        if not frames:
+            return pd.DataFrame(columns=['track_id'] + POINT_COLUMNS), pd.DataFrame(columns=['track_id'])
+
+        tracks = pd.DataFrame(track_records)
+        if 'route_total_calories' in tracks.columns:
+            tracks['route_total_calories'] = tracks['route_total_calories'].astype('Int64')
+        tracks.insert(3, 'source_file', filename)
+        tracks.insert(4, 'file_hash', file_hash)
+        tracks.insert(5, 'file_type', 'gpx')
+        return normalize_point_times(pd.concat(frames, ignore_index=True), tracks)
+
     except Exception as e:
         print(f'Error: {filename} - {e}')
-        return []
+        return None
+
+def expand_master(points, tracks):
+    """Broadcast track-level attributes onto points in master column order
+
+    The readable ``unique_point_id`` is formatted here, on export only.
+    """
+    tracks = tracks.set_index('track_id')
+    extra_columns = [column for column in tracks.columns if column not in MASTER_COLUMNS]
+    master = points.join(tracks, on='track_id')
+    master['unique_point_id'] = format_point_ids(points['latitude'], points['longitude'], points['time'])
+    return master[MASTER_COLUMNS + extra_columns]
+
+def write_master_csv(points, tracks, output_csv, chunk_size=100000):
+    """Write the flat master CSV, joining track attributes chunk by chunk"""
+    for start in range(0, max(len(points), 1), chunk_size):
+        chunk = expand_master(points.iloc[start:start + chunk_size], tracks)
+        chunk.to_csv(output_csv, mode='w' if start == 0 else 'a', header=start == 0,
+                     index=False, encoding='utf-8', date_format=CSV_DATE_FORMAT)
 
-def create_gpx_master_csv(input_dir, output_csv):
-    """Fast creation of master CSV from GPX only"""
+def typed_master(points, tracks):
+    """Build the typed master frame for Parquet/Feather datasets
+
+    The readable id is replaced by the integer ``point_key``. ``time``
+    becomes datetime64 (UTC), ``point_seconds`` numeric, and text
+    track attributes are stored as categoricals (dictionary-encoded on
+    disk), so each distinct value is kept once. Time columns arrive
+    typed (see ``core.times``) and keep their dtypes.
+    """
+    track_pos = pd.Index(tracks['track_id']).get_indexer(points['track_id'])
+    master = expand_master(points.iloc[:0], tracks)
+    columns = {'point_key': points['point_key'].to_numpy()}
+    for column in master.columns.drop('unique_point_id'):
+        if column in points.columns:
+            columns[column] = points[column].array
+        elif (pd.api.types.is_numeric_dtype(tracks[column])
+              or pd.api.types.is_datetime64_any_dtype(tracks[column])):
+            columns[column] = tracks[column].iloc[track_pos].array
+        else:
+            categories = pd.Categorical(tracks[column])
+            columns[column] = pd.Categorical.from_codes(categories.codes[track_pos], categories.categories)
+
+    return pd.DataFrame(columns)
+
+# Bumped when parse results change, so caches of older builds are not replayed
+MANIFEST_VERSION = 2
+
+def manifest_path_for(output_csv):
+    """Path of the ingest manifest kept next to a master CSV"""
+    return os.path.splitext(output_csv)[0] + '_manifest.json'
+
+def load_manifest(manifest_path):
+    """Load per-file ingest records ({filename: {size, mtime, file_hash, rows}})"""
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path, encoding='utf-8') as f:
+        manifest = json.load(f)
+    return manifest.get('files', {}) if manifest.get('version') == MANIFEST_VERSION else {}
+
+def save_manifest(manifest_path, files):
+    """Save per-file ingest records"""
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump({'version': MANIFEST_VERSION, 'files': files}, f, indent=2, ensure_ascii=False)
+
+def file_md5(source, block_size=1 << 20):
+    """MD5 of a file's (decompressed) content, read in blocks"""
+    source = source if isinstance(source, RouteSource) else RouteSource(source)
+    digest = hashlib.md5()
+    with source.open() as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _is_unchanged(source, stat, entry):
+    """Check a file against its manifest entry, hashing only if size/mtime moved"""
+    size, mtime = stat
+    if entry['size'] != size:
+        return False
+    if entry['mtime'] == mtime:
+        return True
+    return entry['file_hash'] == file_md5(source)
+
+def cache_path_for(output_csv):
+    """Directory of the per-file parse cache kept next to a master CSV"""
+    return os.path.splitext(output_csv)[0] + '_cache'
+
+def _cache_file(cache_dir, name):
+    return os.path.join(cache_dir, hashlib.md5(name.encode('utf-8')).hexdigest() + '.pkl')
+
+def save_cached(cache_dir, name, points, tracks):
+    """Keep the parse result of one file, before any duplicate removal"""
+    os.makedirs(cache_dir, exist_ok=True)
+    pd.to_pickle((points, tracks), _cache_file(cache_dir, name))
+
+def has_cached(cache_dir, name):
+    return os.path.exists(_cache_file(cache_dir, name))
+
+def load_cached(cache_dir, name):
+    """Parse result of one file as saved by ``save_cached``, or None"""
+    path = _cache_file(cache_dir, name)
+    return pd.read_pickle(path) if os.path.exists(path) else None
+
+def prune_cache(cache_dir, names):
+    """Remove cached results of files other than ``names``"""
+    if not os.path.isdir(cache_dir):
+        return
+    keep = {os.path.basename(_cache_file(cache_dir, name)) for name in names}
+    for filename in os.listdir(cache_dir):
+        if filename not in keep:
+            os.remove(os.path.join(cache_dir, filename))
+
+def skip_duplicate_tracks(points, tracks, matcher, labels):
+    """Drop tracks that duplicate one already accepted by ``matcher``
+
+    ``labels`` maps track_id to a printable name and is extended with the
+    tracks of this file.
+    """
+    names = dict(zip(tracks['track_id'], tracks['source_file'] + ': ' + tracks['track_name'].astype(str)))
+    duplicates = find_duplicate_tracks(points[['track_id', 'latitude', 'longitude', 'time']], ['track_id'],
+                                       matcher=matcher)
+    labels.update(names)
+    for track_id, (original,) in zip(duplicates['track_id'], duplicates['duplicate_of']):
+        print(f'  Skipped duplicate track {names[track_id]} (same as {labels[original]})')
+    
+    if duplicates.empty:
+        return points, tracks
+    return (points[~points['track_id'].isin(duplicates['track_id'])],
+            tracks[~tracks['track_id'].isin(duplicates['track_id'])])
+
+# Columns of the per-track summary table (route_statistics.csv)
+ROUTE_STAT_COLUMNS = ['route_date', 'route_distance_km', 'route_time', 'route_min_altitude',
+                      'route_max_altitude', 'route_total_calories']
+SUMMARY_COLUMNS = (['source_file', 'track_name', 'route_timestamp', 'points', 'distance_km', 'duration_s',
+                    'moving_time_s', 'elevation_gain_m', 'elevation_loss_m', 'max_speed_kmh', 'avg_speed_kmh',
+                    'min_latitude', 'max_latitude', 'min_longitude', 'max_longitude',
+                    'min_altitude', 'max_altitude', 'start_time', 'end_time']
+                   + ROUTE_STAT_COLUMNS + ['file_hash'])
+SUMMARY_TIME_COLUMNS = ['route_timestamp', 'start_time', 'end_time']
+SUMMARY_TEXT_COLUMNS = ['source_file', 'track_name', 'route_date', 'route_time', 'file_hash']
+
+def summarize_tracks(points, tracks):
+    """Summary rows of the given tracks: computed stats plus description stats"""
+    analyzer = RouteAnalyzer(points[['track_id', 'latitude', 'longitude', 'altitude', 'time']],
+                             track_columns=['track_id'])
+    stats = analyzer.get_track_stats()
+    attributes = tracks.reindex(columns=['track_id'] + [column for column in SUMMARY_COLUMNS
+                                                        if column not in stats.columns])
+    return attributes.merge(stats, on='track_id')[SUMMARY_COLUMNS]
+
+def load_summary(summary_path, source_files):
+    """Summary rows of the given source files from an existing summary table"""
+    summary = pd.read_csv(summary_path, float_precision='round_trip',
+                          dtype={**{column: str for column in SUMMARY_TEXT_COLUMNS}, 'route_total_calories': 'Int64'})
+    # Timestamps are parsed so reused rows are written in the same format as computed ones
+    for column in SUMMARY_TIME_COLUMNS:
+        summary[column] = pd.to_datetime(summary[column], format='ISO8601', utc=True)
+    return summary[summary['source_file'].isin(source_files)].reindex(columns=SUMMARY_COLUMNS)
+
+def update_summary(summary_path, points, tracks, reused_summary=None):
+    """Write the per-track summary table next to the master
+
+    Rows of ``reused_summary`` are kept for tracks that still have the
+    same number of points in the master; all other tracks are computed
+    from their points.
+    """
+    frames = []
+    new = pd.Series(True, index=tracks.index)
+    if reused_summary is not None:
+        counts = points['track_id'].value_counts()
+        current = pd.MultiIndex.from_arrays([tracks['source_file'], tracks['track_name'],
+                                             tracks['track_id'].map(counts)])
+        reused = pd.MultiIndex.from_frame(reused_summary[['source_file', 'track_name', 'points']])
+        new = pd.Series(~current.isin(reused), index=tracks.index)
+        frames.append(reused_summary)
+    if new.any():
+        frames.append(summarize_tracks(points[points['track_id'].isin(tracks.loc[new, 'track_id'])], tracks[new]))
+    summary = pd.concat(frames, ignore_index=True)
+
+    # Keep tracks still in the master, in master order
+    kept = pd.MultiIndex.from_arrays([tracks['source_file'], tracks['track_name'],
+                                      tracks['track_id'].map(points['track_id'].value_counts())])
+    summary = summary[pd.MultiIndex.from_frame(summary[['source_file', 'track_name', 'points']]).isin(kept)]
+    summary = summary.sort_values(['source_file', 'track_name'], kind='stable')
+    summary.to_csv(summary_path, index=False, encoding='utf-8', date_format=CSV_DATE_FORMAT)
+    return summary
+
+def create_gpx_master_csv(input_dir, output_csv, incremental=False, dataset_path=None, skip_duplicates=True):
+    """Fast creation of master CSV from GPX only
+
+    GPX files are picked up plain, gzipped (``.gpx.gz``) or inside
+    ``.zip`` archives, and streamed into the parser without extraction.
+
+    Every file's parse result is cached (``<master>_cache``) before any
+    duplicate removal. With ``incremental`` only files that are new or
+    changed since the last run (size and mtime, or content hash, per the
+    manifest next to the master) are parsed; the others are replayed from
+    the cache, and files no longer present are dropped. The per-track
+    summary table (``route_statistics.csv``) keeps the rows of tracks whose
+    points did not change. The result matches a full rebuild apart from
+    ``processed_timestamp`` (``scripts/check_incremental_build.py`` checks
+    this). With ``dataset_path`` (``.parquet``, ``.feather`` or ``.arrow``)
+    a typed copy of the master is written as well. Returns ``(points,
+    tracks)``; track attributes are only broadcast onto points while
+    writing (see ``expand_master``).
+    
+    With ``skip_duplicates`` tracks that repeat an earlier track (same
+    shape within 25 m, see ``core.duplicates``) are skipped before their
+    points are added. Files are taken in name order, so the first copy
+    wins.
+    """
     
     print('GPX FAST CONVERTER -> MASTER CSV')
     print('=' * 50)
     
-    input_path = Path(input_dir)
-    gpx_files = list(input_path.glob("*.gpx"))
+    gpx_files = list_route_sources(input_dir, kinds=('gpx',))
     
     print(f'Found {len(gpx_files)} GPX files')
     
-    all_data = []
+    manifest_path = manifest_path_for(output_csv)
+    manifest = load_manifest(manifest_path) if incremental and os.path.exists(output_csv) else {}
+    cache_dir = cache_path_for(output_csv)
+    file_stats = {gpx_file.name: gpx_file.stat() for gpx_file in gpx_files}
+    file_sources = {gpx_file.name: gpx_file for gpx_file in gpx_files}
+    unchanged_files = [gpx_file.name for gpx_file in gpx_files
+                       if gpx_file.name in manifest
+                       and _is_unchanged(gpx_file, file_stats[gpx_file.name], manifest[gpx_file.name])
+                       and has_cached(cache_dir, gpx_file.name)]
+    
+    all_points = []
+    all_tracks = []
     processed_files = []
+    track_offset = 0
+    processed_timestamp = datetime.now().isoformat()
+    matcher = TrackMatcher() if skip_duplicates else None
+    track_labels = {}
+    # Hashes of every ingested file, including files whose tracks were all duplicates
+    file_hashes = {}
+    summary_path = summary_path_for(output_csv)
+    reused_summary = None
     
+    if unchanged_files:
+        deleted = len(set(manifest) - set(file_stats))
+        print(f'Incremental: {len(unchanged_files)} unchanged, '
+              f'{len(gpx_files) - len(unchanged_files)} new or changed, {deleted} deleted')
+        if os.path.exists(summary_path):
+            reused_summary = load_summary(summary_path, unchanged_files)
+    
+    # One pass in name order over every file's parse result, taken from the
+    # cache for unchanged files, so duplicates resolve exactly as in a full rebuild
     for gpx_file in gpx_files:
-        track_data = process_gpx_fast(str(gpx_file))
+        result = load_cached(cache_dir, gpx_file.name) if gpx_file.name in unchanged_files else None
+        if result is None:
+            result = process_gpx_fast(gpx_file)
+            if result is None or not len(result[0]):
+                continue
+            result[1]['processed_timestamp'] = processed_timestamp
+            save_cached(cache_dir, gpx_file.name, *result)
+            print(f'  {len(result[0])} points')
+        points, tracks = result
+        
+        # Make track ids unique across files
+        points['track_id'] += track_offset
+        tracks['track_id'] += track_offset
+        track_offset += len(tracks)
+        file_hashes[gpx_file.name] = tracks['file_hash'].iloc[0]
         
-        if track_data:
-            all_data.extend(track_data)
-            processed_files.append(gpx_file.name)
-            print(f'  {len(track_data)} points')
+        if matcher is not None:
+            points, tracks = skip_duplicate_tracks(points, tracks, matcher, track_labels)
+        all_points.append(points)
+        all_tracks.append(tracks)
+        processed_files.append(gpx_file.name)
+    close_archives()
     
-    if not all_data:
+    if not all_points:
         print('No data!')
         return None
     
-    # DataFrame and duplicate removal
-    master_df = pd.DataFrame(all_data)
-    initial_count = len(master_df)
-    master_df = master_df.drop_duplicates(subset=['unique_point_id'], keep='first')
-    removed = initial_count - len(master_df)
+    # Duplicate removal on the integer point key (the first file in name order wins)
+    points = pd.concat(all_points, ignore_index=True)
+    tracks = pd.concat(all_tracks, ignore_index=True)
+    points['point_key'] = point_keys(points['latitude'], points['longitude'], points['time'])
+    initial_count = len(points)
+    points = points[~points['point_key'].duplicated(keep='first')]
+    removed = initial_count - len(points)
     
-    # Sorting
-    master_df = master_df.sort_values(['source_file', 'track_name']).reset_index(drop=True)
+    # Sorting by source_file and track_name, via the rank of each track
+    track_rank = np.empty(track_offset, dtype=np.int64)
+    track_rank[tracks.sort_values(['source_file', 'track_name'])['track_id'].to_numpy()] = np.arange(len(tracks))
+    order = np.argsort(track_rank[points['track_id'].to_numpy()], kind='stable')
+    points = points.iloc[order].reset_index(drop=True)
+    tracks = tracks[tracks['track_id'].isin(points['track_id'].unique())].reset_index(drop=True)
     
-    # Save to CSV
-    master_df.to_csv(output_csv, index=False, encoding='utf-8')
+    # Save to CSV and record what was ingested
+    write_master_csv(points, tracks, output_csv)
+    prune_cache(cache_dir, file_hashes)
+    rows = points['track_id'].map(tracks.set_index('track_id')['source_file']).value_counts()
+    save_manifest(manifest_path, {
+        name: {
+            'path': file_sources[name].path,
+            'member': file_sources[name].member,
+            'size': file_stats[name][0],
+            'mtime': file_stats[name][1],
+            'file_hash': file_hash,
+            'rows': int(rows.get(name, 0)),
+        }
+        for name, file_hash in file_hashes.items()
+    })
     
     # Statistics
     print("\n" + "=" * 50)
     print('STATISTICS')
     print("=" * 50)
     print(f'Files: {len(processed_files)}')
-    print(f'Points: {len(master_df)} (removed {removed} duplicates)')
-    print(f'Tracks: {master_df["track_name"].nunique()}')
-    print(f'Altitude: {master_df["altitude"].min():.1f} - {master_df["altitude"].max():.1f} m')
+    print(f'Points: {len(points)} (removed {removed} duplicates)')
+    print(f'Tracks: {tracks["track_name"].nunique()}')
+    print(f'Altitude: {points["altitude"].min():.1f} - {points["altitude"].max():.1f} m')
     
-    if 'route_total_calories' in master_df.columns:
-        calories = master_df['route_total_calories'].dropna()
+    if 'route_total_calories' in tracks.columns:
+        calories = tracks['route_total_calories'].dropna()
         if not calories.empty:
             print(f'Calories: {calories.min()} - {calories.max()} kcal (avg {calories.mean():.0f})')
     
     # Time statistics
-    has_time = master_df['time'] != 'no_time'
-    print(f'Points with time: {has_time.sum()} / {len(master_df)}')
+    has_time = points['time'].notna()
+    print(f'Points with time: {has_time.sum()} / {len(points)}')
     
-    if 'point_clock' in master_df.columns:
-        has_clock = master_df['point_clock'].notna()
-        print(f'Points with clock: {has_clock.sum()} / {len(master_df)}')
+    has_clock = points['point_clock'].notna()
+    print(f'Points with clock: {has_clock.sum()} / {len(points)}')
     
     print(f'Saved to: {output_csv}')
     print(f'Size: {os.path.getsize(output_csv) / 1024 / 1024:.1f} MB')
     
-    return master_df
+    if dataset_path:
+        write_master_dataset(typed_master(points, tracks), dataset_path)
+        print(f'Dataset: {dataset_path} ({os.path.getsize(dataset_path) / 1024 / 1024:.1f} MB)')
+    
+    # Spatial index over the rows just written (after the master, so it is not stale)
+    index_path = SpatialIndex.build(
+        points['latitude'], points['longitude'],
+        points['track_id'].map(pd.Series(np.arange(len(tracks)), index=tracks['track_id'])),
+        tracks[['source_file', 'track_name']].itertuples(index=False, name=None),
+    ).save(index_path_for(output_csv))
+    print(f'Spatial index: {index_path}')
+    
+    # Per-track summary, written last so it is never older than the master
+    summary = update_summary(summary_path, points, tracks, reused_summary)
+    print(f'Route summary: {summary_path} ({len(summary)} tracks)')
+    
+    return points, tracks
 
 def main():
     """Main function"""
+    parser = argparse.ArgumentParser(description='GPX files -> master CSV')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Only parse new or changed files, reusing the existing master')
+    parser.add_argument('--dataset-format', choices=['parquet', 'feather'],
+                        help='Also write a typed gps_master.<format> dataset (needs pyarrow)')
+    parser.add_argument('--keep-duplicate-tracks', action='store_true',
+                        help='Do not skip tracks that repeat an earlier track')
+    args = parser.parse_args()
+
     base_dir = os.path.dirname(__file__)
     # Go up to project root, then to data folder
     project_root = os.path.dirname(os.path.dirname(base_dir))
@@ -284,13 +543,17 @@ def main():
     os.makedirs(output_dir, exist_ok=True)
     output_csv = os.path.join(output_dir, 'gps_master.csv')
     
-    master_df = create_gpx_master_csv(input_dir, output_csv)
+    dataset_path = os.path.join(output_dir, f'gps_master.{args.dataset_format}') if args.dataset_format else None
+    result = create_gpx_master_csv(input_dir, output_csv, incremental=args.incremental, dataset_path=dataset_path,
+                                   skip_duplicates=not args.keep_duplicate_tracks)
     
-    if master_df is not None:
-        print(f'\nColumns: {list(master_df.columns)}')
+    if result is not None:
+        points, tracks = result
+        sample = expand_master(points.head(3), tracks)
+        print(f'\nColumns: {list(sample.columns)}')
         print(f'\nFirst 3 rows:')
-        print(master_df.head(3).to_string())
-        return master_df
+        print(sample.to_string())
+        return result
     
     return None
 
@@ -1,10 +1,18 @@
-import pandas as pd
+import os
+import sys
 import matplotlib.pyplot as plt
 import seaborn as sns
 import numpy as np
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+from core.dataset import default_master_path, read_master
+from core.elevation import clean_elevation, hysteresis
+from core.geodesy import segment_diff, segment_distances
+from core.segmentation import classify_modes, mode_labels, mode_segments
+
 # Load data
-df = pd.read_csv('data/output/gps_master.csv')
+df = read_master(default_master_path('data/output'),
+                 columns=['track_name', 'latitude', 'longitude', 'altitude', 'point_seconds'])
 
 # Get Valleymount to Blessington route
 valleymount_route = df[df['track_name'] == 'valleymount to blessington  12/10/2025 09:22'].copy()
@@ -12,8 +20,8 @@ valleymount_route = df[df['track_name'] == 'valleymount to blessington  12/10/20
 print(f'Route: valleymount to blessington  12/10/2025 09:22')
 print(f'Total points: {len(valleymount_route)}')
 
-# Convert time data
-valleymount_route['time_seconds'] = pd.to_numeric(valleymount_route['point_seconds'], errors='coerce')
+# Elapsed seconds are stored typed (nullable integer)
+valleymount_route['time_seconds'] = valleymount_route['point_seconds'].astype('float64')
 valleymount_route['time_minutes'] = valleymount_route['time_seconds'] / 60
 
 # Remove rows with missing time data
@@ -21,14 +29,16 @@ valleymount_route = valleymount_route.dropna(subset=['time_seconds'])
 
 # Calculate distance and speed properly
 valleymount_route = valleymount_route.reset_index(drop=True)
-valleymount_route['lat_diff'] = valleymount_route['latitude'].diff()
-valleymount_route['lon_diff'] = valleymount_route['longitude'].diff()
-valleymount_route['time_diff'] = valleymount_route['time_seconds'].diff()
+valleymount_route['time_diff'] = segment_diff(valleymount_route['time_seconds'])
+
+# Cleaned elevation: gaps interpolated, rolling-mean smoothed; gain over a 3 m dead band
+valleymount_route['altitude'] = clean_elevation(valleymount_route['altitude'])
+climb = np.diff(hysteresis(valleymount_route['altitude']))
+print(f'Elevation gain: {climb[climb > 0].sum():.0f} m, loss: {abs(climb[climb < 0].sum()):.0f} m')
 
-# Calculate distance using Haversine approximation
-valleymount_route['distance_km'] = np.sqrt(
-    valleymount_route['lat_diff']**2 + valleymount_route['lon_diff']**2
-) * 111  # Approximate conversion
+# Calculate distance using Haversine
+valleymount_route['distance_km'] = segment_distances(valleymount_route['latitude'],
+                                                     valleymount_route['longitude']) / 1000
 
 # Calculate speed (avoiding division by zero)
 valleymount_route['speed_kmh'] = np.where(
@@ -46,6 +56,15 @@ valleymount_route['speed_kmh'] = np.where(
 
 print(f'Points with valid speed: {valleymount_route["speed_kmh"].notna().sum()}')
 
+# Classify each point as stationary/walking/vehicle from its rolling speed
+modes = classify_modes(valleymount_route['distance_km'] * 1000, valleymount_route['time_diff'])
+valleymount_route['mode'] = mode_labels(modes)
+mode_table = mode_segments(modes, valleymount_route['distance_km'] * 1000, valleymount_route['time_diff'])
+print(mode_table[['mode', 'points', 'distance_m', 'duration_s', 'avg_speed_kmh']].round(1).to_string())
+
+# Start of every vehicle segment that follows another mode
+transitions = mode_table.loc[(mode_table['mode'] == 'vehicle') & (mode_table['segment'] > 0), 'start'].to_numpy()
+
 # Create Anscombe's quartet-like analysis
 fig, axes = plt.subplots(2, 2, figsize=(15, 12))
 fig.suptitle("Anscombe's Quartet Analysis - Valleymount to Blessington Route", fontsize=16)
@@ -74,11 +93,11 @@ axes[1, 0].set_xlabel('Longitude')
 axes[1, 0].set_ylabel('Latitude')
 axes[1, 0].grid(True, alpha=0.3)
 
-# Dataset 4: Time vs Altitude (last 25% - car journey)
-last_25_percent = valleymount_route.tail(int(len(valleymount_route) * 0.25))
-axes[1, 1].scatter(last_25_percent['time_minutes'], 
-                   last_25_percent['altitude'], alpha=0.6, color='red')
-axes[1, 1].set_title('Dataset IV: Time vs Altitude (Last 25% - Car Journey)')
+# Dataset 4: Time vs Altitude (vehicle segments - car journey)
+car_data = valleymount_route[valleymount_route['mode'] == 'vehicle']
+axes[1, 1].scatter(car_data['time_minutes'], 
+                   car_data['altitude'], alpha=0.6, color='red')
+axes[1, 1].set_title('Dataset IV: Time vs Altitude (Vehicle Segments - Car Journey)')
 axes[1, 1].set_xlabel('Time (minutes)')
 axes[1, 1].set_ylabel('Altitude (m)')
 axes[1, 1].grid(True, alpha=0.3)
@@ -108,16 +127,15 @@ print(f'Longitude: mean={valleymount_route["longitude"].mean():.6f}, std={valley
 print(f'Latitude: mean={valleymount_route["latitude"].mean():.6f}, std={valleymount_route["latitude"].std():.6f}')
 print(f'Correlation: {valleymount_route["longitude"].corr(valleymount_route["latitude"]):.3f}')
 
-# Dataset 4: Last 25% - Car journey
-print('\nDataset IV: Time vs Altitude (Last 25% - Car Journey)')
-print(f'Time: mean={last_25_percent["time_minutes"].mean():.1f}, std={last_25_percent["time_minutes"].std():.1f}')
-print(f'Altitude: mean={last_25_percent["altitude"].mean():.1f}, std={last_25_percent["altitude"].std():.1f}')
-print(f'Correlation: {last_25_percent["time_minutes"].corr(last_25_percent["altitude"]):.3f}')
+# Dataset 4: Vehicle segments - Car journey
+print('\nDataset IV: Time vs Altitude (Vehicle Segments - Car Journey)')
+print(f'Time: mean={car_data["time_minutes"].mean():.1f}, std={car_data["time_minutes"].std():.1f}')
+print(f'Altitude: mean={car_data["altitude"].mean():.1f}, std={car_data["altitude"].std():.1f}')
+print(f'Correlation: {car_data["time_minutes"].corr(car_data["altitude"]):.3f}')
 
 # Additional analysis: Speed changes (walking vs car)
 print('\n=== SPEED ANALYSIS (Walking vs Car) ===')
-walking_data = valleymount_route.head(int(len(valleymount_route) * 0.75))
-car_data = last_25_percent
+walking_data = valleymount_route[valleymount_route['mode'] == 'walking']
 
 walking_speed = walking_data['speed_kmh'].dropna()
 car_speed = car_data['speed_kmh'].dropna()
@@ -135,8 +153,9 @@ plt.figure(figsize=(12, 6))
 plt.plot(valleymount_route['time_minutes'], 
          valleymount_route['speed_kmh'].fillna(0), 
          alpha=0.7, label='Speed over time')
-plt.axvline(x=walking_data['time_minutes'].max(), color='red', 
-            linestyle='--', label='Transition to car')
+for i, transition_idx in enumerate(transitions):
+    plt.axvline(x=valleymount_route['time_minutes'].iloc[transition_idx], color='red', 
+                linestyle='--', label='Transition to car' if i == 0 else None)
 plt.xlabel('Time (minutes)')
 plt.ylabel('Speed (km/h)')
 plt.title('Speed Changes - Valleymount to Blessington Route')
@@ -146,12 +165,14 @@ plt.savefig('valleymount_speed_analysis.png', dpi=300, bbox_inches='tight')
 plt.show()
 
 print('\n=== TRANSITION POINT ANALYSIS ===')
-transition_idx = len(walking_data)
-transition_point = valleymount_route.iloc[transition_idx]
-print(f'Transition point (getting in car):')
-print(f'  Time: {transition_point["time_minutes"]:.1f} minutes')
-print(f'  Location: {transition_point["latitude"]:.6f}, {transition_point["longitude"]:.6f}')
-print(f'  Altitude: {transition_point["altitude"]:.1f} m')
+if len(transitions) == 0:
+    print('No transition to a vehicle detected')
+for transition_idx in transitions:
+    transition_point = valleymount_route.iloc[transition_idx]
+    print(f'Transition point (getting in car):')
+    print(f'  Time: {transition_point["time_minutes"]:.1f} minutes')
+    print(f'  Location: {transition_point["latitude"]:.6f}, {transition_point["longitude"]:.6f}')
+    print(f'  Altitude: {transition_point["altitude"]:.1f} m')
 
 print('\nAnalysis complete! Check the generated plots:')
 print('- valleymount_anscombe_quartet.png')
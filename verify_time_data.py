@@ -1,30 +1,47 @@
-import pandas as pd
+import os
+import sys
 
-df = pd.read_csv('data/output/gps_master.csv')
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+from core.dataset import default_master_path, iter_master
+
+# Streamed in chunks, so the master never has to fit in memory
+chunks = iter_master(default_master_path('data/output'),
+                     columns=['track_name', 'altitude', 'time', 'source_file', 'point_clock', 'point_seconds'],
+                     chunk_size=500_000)
+
+time_columns = ['time', 'point_clock', 'point_seconds']
+total_points = 0
+backup_points = 0
+non_null = dict.fromkeys(time_columns, 0)
+backup_non_null = dict.fromkeys(time_columns, 0)
+samples = []
+
+for df in chunks:
+    backup_files = df[df['source_file'].astype(str).str.contains('full_backup', na=False)]
+    total_points += len(df)
+    backup_points += len(backup_files)
+    for col in time_columns:
+        non_null[col] += int(df[col].notna().sum())
+        backup_non_null[col] += int(backup_files[col].notna().sum())
+    if len(samples) < 5:
+        samples.extend(backup_files[backup_files['point_clock'].notna()].head(5 - len(samples)).to_dict('records'))
 
 print('=== TIME DATA VERIFICATION ===')
-print(f'Total points: {len(df)}')
+print(f'Total points: {total_points}')
 
 # Check time columns
-time_columns = ['time', 'point_clock', 'point_seconds']
 for col in time_columns:
-    if col in df.columns:
-        non_null = df[col].notna().sum()
-        print(f'{col}: {non_null} / {len(df)} points have data')
+    print(f'{col}: {non_null[col]} / {total_points} points have data')
 
 # Check backup files specifically
-backup_files = df[df['source_file'].str.contains('full_backup', na=False)]
-print(f'\nBackup files: {len(backup_files)} points')
+print(f'\nBackup files: {backup_points} points')
 
 for col in time_columns:
-    if col in df.columns:
-        non_null = backup_files[col].notna().sum()
-        print(f'Backup {col}: {non_null} / {len(backup_files)} points have data')
+    print(f'Backup {col}: {backup_non_null[col]} / {backup_points} points have data')
 
 # Sample backup data
 print('\n=== Sample backup points with time ===')
-backup_sample = backup_files[backup_files['point_clock'].notna()].head(5)
-for idx, row in backup_sample.iterrows():
+for row in samples:
     print(f"Track: {row['track_name'][:30]}...")
     print(f"  Time: {row['time']}")
     print(f"  Clock: {row['point_clock']}")